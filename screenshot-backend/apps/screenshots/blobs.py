@@ -0,0 +1,83 @@
+"""上传视频的内容寻址存储
+
+上传写入时顺带计算摘要（分片上传为各分片 SHA-256 列表的摘要，见 chunk_list_digest），
+写完后目标文件硬链接到 VIDEO_BLOB_ROOT/<前两位>/<摘要>。
+内容相同的视频已有 blob 时，目标文件直接替换成指向该 blob 的硬链接，
+磁盘和页缓存中只保留一份数据。blob 只剩自身一个链接时即无人引用，可由
+prune_video_blobs 命令清理。
+"""
+import errno
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def blob_root():
+    return settings.VIDEO_BLOB_ROOT
+
+
+def blob_path(digest):
+    return blob_root() / digest[:2] / digest
+
+
+def file_sha256(path):
+    """计算文件的 SHA-256（十六进制）"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(HASH_BUFFER_SIZE)
+            if not data:
+                break
+            sha.update(data)
+    return sha.hexdigest()
+
+
+def chunk_list_digest(chunks):
+    """由各分片的 (大小, SHA-256 摘要字节) 计算上传内容的摘要（十六进制）
+
+    分片在保存时已经算过摘要，对摘要列表再做一次 SHA-256 即可得到内容的键，
+    不用把整个文件再读一遍。相同内容按相同大小分片，结果相同。
+    """
+    sha = hashlib.sha256()
+    for size, digest in chunks:
+        sha.update(size.to_bytes(8, 'little'))
+        sha.update(digest)
+    return sha.hexdigest()
+
+
+def link_to_blob(file_path, digest):
+    """把 file_path 登记到内容寻址存储，返回是否与已有视频去重
+
+    已有相同内容的 blob 时用硬链接替换 file_path；否则把 file_path 硬链接为新 blob。
+    blob 目录与目标文件不在同一文件系统等无法硬链接的情况下不做处理。
+    """
+    blob = blob_path(digest)
+    try:
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            blob_st = blob.stat()
+        except FileNotFoundError:
+            blob_st = None
+        file_st = file_path.stat()
+
+        if blob_st is not None and (blob_st.st_dev, blob_st.st_ino) == (file_st.st_dev, file_st.st_ino):
+            return False
+        if blob_st is not None and blob_st.st_size == file_st.st_size:
+            tmp = file_path.with_name(f'.{file_path.name}.{os.getpid()}.{threading.get_ident()}.link')
+            os.link(blob, tmp)
+            os.replace(tmp, file_path)
+            return True
+
+        # 新内容（或大小不符的损坏 blob）：以当前文件作为 blob
+        tmp = blob.with_name(f'.{digest}.{os.getpid()}.{threading.get_ident()}.tmp')
+        os.link(file_path, tmp)
+        os.replace(tmp, blob)
+        return False
+    except OSError as e:
+        if e.errno in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            return False
+        raise
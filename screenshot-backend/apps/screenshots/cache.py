@@ -0,0 +1,82 @@
+"""进程内按字节数限额的 LRU 缓存
+
+缓存已渲染好的响应体，以文件路径为键，并以文件 mtime/大小校验是否过期，
+文件变化后旧内容自然被替换。命中、未命中、淘汰次数由 stats() 给出，
+登记到 config.metrics，出现在 /api/metrics/ 和后台统计面板中。
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from config.metrics import register_stats
+
+
+class SizedLRUCache:
+    """按值的字节数限额的 LRU 缓存"""
+
+    def __init__(self, max_bytes, max_item_bytes=None):
+        self.max_bytes = max_bytes
+        # 单个值超过 max_item_bytes 时不缓存，默认为总限额的 1/4，避免一个大文件挤掉所有条目
+        self.max_item_bytes = max_bytes // 4 if max_item_bytes is None else max_item_bytes
+        self._data = OrderedDict()  # key -> (version, value, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version):
+        """version 与缓存时一致才算命中"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] != version:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, version, value, size):
+        if size > self.max_item_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            self._data[key] = (version, value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._data:
+                _key, (_version, _value, evicted) = self._data.popitem(last=False)
+                self.current_bytes -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_component_cache = None
+_component_cache_lock = threading.Lock()
+
+
+def get_component_cache():
+    """Component IO Check 渲染结果缓存"""
+    global _component_cache
+    if _component_cache is None:
+        with _component_cache_lock:
+            if _component_cache is None:
+                _component_cache = SizedLRUCache(
+                    getattr(settings, 'COMPONENT_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+                )
+    return _component_cache
+
+
+register_stats('component_cache', lambda: get_component_cache().stats())
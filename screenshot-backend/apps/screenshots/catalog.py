@@ -0,0 +1,470 @@
+"""截图目录内存索引
+
+每个 worker 进程首次访问时并行扫描 SCREENSHOTS_ROOT，在内存中建立
+mode → brand → model → 文件 的目录树，之后通过 inotify 事件增量刷新
+（不可用时退化为目录 mtime 轮询），视图直接读内存，不再每次请求遍历目录。
+往目录里放文件后无需重启服务即可被搜索到。
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DirNode:
+    """目录节点：子目录、文件名列表、目录 mtime 以及子树版本号"""
+    __slots__ = ('name', 'parent', 'dirs', 'files', 'mtime_ns', 'version')
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.dirs = {}
+        self.files = ()
+        self.mtime_ns = None
+        self.version = 0
+
+    @property
+    def parts(self):
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return tuple(reversed(parts))
+
+
+def _scan_dir(path):
+    """扫描单个目录，返回 (子目录名, 排序后的文件名, mtime_ns)，目录不存在时返回 None"""
+    dirs, files = [], []
+    try:
+        # 先取 mtime 再列目录：扫描期间发生的变更会在下次检查时被发现
+        mtime_ns = os.stat(path).st_mtime_ns
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        dirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    return dirs, tuple(sorted(files)), mtime_ns
+
+
+class Catalog:
+    """SCREENSHOTS_ROOT 的内存目录树"""
+
+    def __init__(self, root, scan_workers=8, excluded=()):
+        self.root_path = Path(root)
+        self.scan_workers = max(1, scan_workers)
+        # 根目录下只登记名字、不进入扫描的目录（如上传分片的临时目录）
+        self.excluded = set(excluded)
+        self.root = DirNode('')
+        self._lock = threading.RLock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.poll_interval = 5.0
+
+    # ---------- 构建与刷新 ----------
+
+    def path_of(self, node):
+        return self.root_path.joinpath(*node.parts)
+
+    def _descend(self, parent, name):
+        return not (parent is self.root and name in self.excluded)
+
+    def _fill(self, nodes):
+        """逐层并行扫描 nodes 及其全部子目录"""
+        pending = list(nodes)
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as pool:
+            while pending:
+                results = pool.map(_scan_dir, [self.path_of(n) for n in pending])
+                next_level = []
+                for node, result in zip(pending, results):
+                    if result is None:
+                        continue
+                    dirs, files, mtime_ns = result
+                    node.files = files
+                    node.mtime_ns = mtime_ns
+                    children = {}
+                    for name in dirs:
+                        child = DirNode(name, node)
+                        children[name] = child
+                        if self._descend(node, name):
+                            next_level.append(child)
+                    node.dirs = children
+                pending = next_level
+
+    def build(self):
+        """冷启动：全量扫描，完成后整体替换根节点"""
+        started = time.monotonic()
+        root = DirNode('')
+        self._fill([root])
+        with self._lock:
+            root.version = self.root.version + 1
+            self.root = root
+        logger.info('Screenshot catalog built in %.2fs', time.monotonic() - started)
+
+    def _bump(self, node):
+        while node is not None:
+            node.version += 1
+            node = node.parent
+
+    def refresh(self, node, touched=False):
+        """重新扫描单个目录，新增的子目录整棵扫描，返回是否有变化
+
+        touched 表示已知目录内有文件内容变化（写入完成、同名替换），文件名不变时也递增版本号。
+        """
+        with self._lock:
+            if node.parent is not None and node.parent.dirs.get(node.name) is not node:
+                return False  # 节点已从树中移除
+            result = _scan_dir(self.path_of(node))
+            if result is None:
+                if node.parent is not None:
+                    dirs = dict(node.parent.dirs)
+                    del dirs[node.name]
+                    node.parent.dirs = dirs
+                    self._bump(node.parent)
+                else:
+                    node.dirs, node.files, node.mtime_ns = {}, (), None
+                    self._bump(node)
+                return True
+
+            names, files, mtime_ns = result
+            changed = files != node.files or set(names) != set(node.dirs)
+            node.mtime_ns = mtime_ns
+            if not changed:
+                if touched:
+                    self._bump(node)
+                return touched
+
+            dirs = {}
+            added = []
+            for name in names:
+                child = node.dirs.get(name)
+                if child is None:
+                    child = DirNode(name, node)
+                    if self._descend(node, name):
+                        added.append(child)
+                dirs[name] = child
+            if added:
+                self._fill(added)
+            # 整体替换引用，读请求无需加锁
+            node.files = files
+            node.dirs = dirs
+            self._bump(node)
+            return True
+
+    def refresh_path(self, path):
+        """按绝对路径刷新目录（路径不在树中时刷新其最近的已知祖先）"""
+        try:
+            rel = Path(path).relative_to(self.root_path)
+        except ValueError:
+            return False
+        node = self.root
+        for part in rel.parts:
+            child = node.dirs.get(part)
+            if child is None or not self._descend(node, part):
+                break
+            node = child
+        return self.refresh(node)
+
+    def iter_nodes(self):
+        """遍历所有已扫描的目录节点"""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            for name, child in node.dirs.items():
+                if self._descend(node, name):
+                    stack.append(child)
+
+    # ---------- 查询 ----------
+
+    def lookup(self, *parts):
+        node = self.root
+        for part in parts:
+            node = node.dirs.get(part)
+            if node is None:
+                return None
+        return node
+
+    def exists(self, *parts):
+        return self.lookup(*parts) is not None
+
+    def version(self, *parts):
+        """子树版本号，目录不存在时返回 None
+
+        子树内文件/目录增删、改名，以及文件写入完成（inotify IN_CLOSE_WRITE）、同名替换时递增。
+        轮询模式下只能通过目录 mtime 发现变化：原地改写文件（不经过改名）不会使版本号变化，
+        依赖文件内容的缓存仍需自行比对文件的 mtime/大小。
+        """
+        node = self.lookup(*parts)
+        return node.version if node is not None else None
+
+    def list_dirs(self, *parts, exclude=()):
+        """列出非隐藏子目录（已排序）"""
+        node = self.lookup(*parts)
+        if node is None:
+            return []
+        return sorted(
+            name for name in node.dirs
+            if not name.startswith('.') and name not in exclude
+        )
+
+    def iter_files(self, *parts, recursive=False):
+        """遍历文件，产出 (相对 SCREENSHOTS_ROOT 的 posix 路径, 文件名)"""
+        node = self.lookup(*parts)
+        if node is None:
+            return
+        stack = [(node, '/'.join(parts))]
+        while stack:
+            node, prefix = stack.pop()
+            for name in node.files:
+                yield f'{prefix}/{name}' if prefix else name, name
+            if recursive:
+                for name, child in node.dirs.items():
+                    if self._descend(node, name):
+                        stack.append((child, f'{prefix}/{name}' if prefix else name))
+
+    # ---------- 变更监听 ----------
+
+    def start_watching(self, mode='auto', poll_interval=5.0):
+        """启动后台线程监听目录变化：inotify 优先，失败时退化为 mtime 轮询"""
+        self.poll_interval = poll_interval
+        target = None
+        if mode in ('auto', 'inotify'):
+            try:
+                inotify = _Inotify()
+                target = lambda: self._watch_inotify(inotify)
+            except OSError as e:
+                if mode == 'inotify':
+                    raise
+                logger.warning('inotify unavailable (%s), falling back to polling', e)
+        if target is None and mode in ('auto', 'poll'):
+            target = lambda: self._watch_poll(poll_interval)
+        if target is None:
+            return
+        self._watcher = threading.Thread(target=target, name='screenshot-catalog', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_if_changed(self, node):
+        try:
+            mtime_ns = os.stat(self.path_of(node)).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns != node.mtime_ns:
+            # 目录 mtime 变化但文件名不变时多半是同名替换（os.replace），同样递增版本号
+            self.refresh(node, touched=True)
+
+    def _poll_once(self):
+        if self.root.mtime_ns is None and not self.root_path.exists():
+            return
+        for node in list(self.iter_nodes()):
+            self._refresh_if_changed(node)
+
+    def _watch_poll(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self._poll_once()
+            except Exception:
+                logger.exception('Screenshot catalog poll failed')
+
+    def _watch_inotify(self, inotify):
+        watches = {}  # wd -> [node, ...]（同一 inode 可能对应多个节点）
+        watched = {}  # node -> wd
+
+        def sync_watches():
+            """为新目录加监听、移除已消失目录的监听，返回新加监听的节点"""
+            current = set(self.iter_nodes())
+            for node in [n for n in watched if n not in current]:
+                wd = watched.pop(node)
+                nodes = watches.get(wd, [])
+                if node in nodes:
+                    nodes.remove(node)
+                if not nodes:
+                    watches.pop(wd, None)
+                    inotify.rm_watch(wd)
+            added = []
+            for node in current:
+                if node in watched:
+                    continue
+                try:
+                    wd = inotify.add_watch(self.path_of(node))
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    # 监听数超过 fs.inotify.max_user_watches 等情况，改用轮询
+                    raise _WatchLimit(e)
+                watches.setdefault(wd, []).append(node)
+                watched[node] = wd
+                added.append(node)
+            return added
+
+        try:
+            # 根目录不存在时等待其出现
+            while not self.root_path.exists():
+                if self._stop.wait(5.0):
+                    return
+                continue
+            if self.root.mtime_ns is None:
+                self.build()
+            # 建立监听前可能已有变更，按 mtime 补扫一次
+            for node in sync_watches():
+                self._refresh_if_changed(node)
+            sync_watches()
+
+            while not self._stop.is_set():
+                readable, _, _ = select.select([inotify.fd], [], [], 1.0)
+                if not readable:
+                    continue
+                # 合并一小段时间内的事件，避免批量拷贝文件时反复扫描
+                time.sleep(0.05)
+                dirty = set()
+                touched = set()
+                overflow = False
+                for wd, mask, _name in inotify.read_events():
+                    if mask & _Inotify.IN_Q_OVERFLOW:
+                        overflow = True
+                        continue
+                    nodes = watches.get(wd, [])
+                    if mask & _Inotify.IN_IGNORED:
+                        # 内核已自动移除该监听
+                        watches.pop(wd, None)
+                        for node in nodes:
+                            watched.pop(node, None)
+                    for node in nodes:
+                        dirty.add(node)
+                        if mask & (_Inotify.IN_CLOSE_WRITE | _Inotify.IN_MOVED_TO):
+                            touched.add(node)
+                if overflow:
+                    self._poll_once()
+                for node in dirty:
+                    self.refresh(node, touched=node in touched)
+                for node in sync_watches():
+                    self._refresh_if_changed(node)
+        except _WatchLimit as e:
+            logger.warning('inotify watch failed (%s), falling back to polling', e.args[0])
+            inotify.close()
+            self._watch_poll(self.poll_interval)
+        except Exception:
+            logger.exception('Screenshot catalog watcher crashed, falling back to polling')
+            inotify.close()
+            self._watch_poll(self.poll_interval)
+        else:
+            inotify.close()
+
+
+class _WatchLimit(Exception):
+    pass
+
+
+class _Inotify:
+    """libc inotify 的最小封装（通过 ctypes 调用，无额外依赖）"""
+    IN_CLOSE_WRITE = 0x00000008
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+
+    MASK = (IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+            | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        if not hasattr(os, 'O_CLOEXEC'):
+            raise OSError('inotify is only available on Linux')
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError('inotify is not supported by libc')
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def rm_watch(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+_catalog = None
+_catalog_pid = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """返回当前进程的目录索引，首次调用时构建并启动监听"""
+    global _catalog, _catalog_pid
+    catalog = _catalog
+    root = Path(settings.SCREENSHOTS_ROOT)
+    if catalog is not None and _catalog_pid == os.getpid() and catalog.root_path == root:
+        return catalog
+    with _catalog_lock:
+        catalog = _catalog
+        if catalog is None or _catalog_pid != os.getpid() or catalog.root_path != root:
+            if catalog is not None and _catalog_pid == os.getpid():
+                catalog.stop()
+            catalog = Catalog(
+                root,
+                scan_workers=getattr(settings, 'CATALOG_SCAN_WORKERS', 8),
+                excluded=getattr(settings, 'CATALOG_EXCLUDED_DIRS', ('temp_chunks', '.thumbnails', '.blobs')),
+            )
+            catalog.build()
+            catalog.start_watching(
+                mode=getattr(settings, 'CATALOG_WATCH_MODE', 'auto'),
+                poll_interval=getattr(settings, 'CATALOG_POLL_INTERVAL', 5.0),
+            )
+            _catalog = catalog
+            _catalog_pid = os.getpid()
+    return catalog
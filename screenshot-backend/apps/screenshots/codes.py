@@ -0,0 +1,69 @@
+"""错误代码归一化
+
+同一个代码常被输入成不同形式：005-120、005120、05-120、005 120、E-5-120。
+归一化规则：
+- casefold，去掉所有分隔符（非字母数字字符）；
+- 连续的字母、数字分成不同的段，位数不足 CODE_SEGMENT_WIDTH 的数字段左侧补 0；
+- 拼接各段。
+
+例如 005-120、05-120、005 120 都归一化为 005120，E-5-120 与 e005-120 都是 e005120。
+没有分隔符的数字串（如 05120）无法判断分段，保持原样，由容错匹配兜底。
+"""
+import re
+
+# 数字段补齐的位数
+CODE_SEGMENT_WIDTH = 3
+
+# 容错匹配（编辑距离 1）要求的最短归一化代码长度，过短的代码容错后几乎能匹配任何东西
+FUZZY_MIN_LENGTH = 4
+
+_WORD_RE = re.compile(r'[^\W_]+')
+_SEGMENT_RE = re.compile(r'\d+|\D+')
+
+
+def code_segments(text):
+    """拆分为字母段和数字段（已 casefold）"""
+    segments = []
+    for word in _WORD_RE.findall(text.casefold()):
+        segments.extend(_SEGMENT_RE.findall(word))
+    return segments
+
+
+def normalize_code(text, partial=False):
+    """归一化代码；partial 为 True 时最后一个数字段不补 0（用于前缀匹配，输入可能还没打完）"""
+    segments = code_segments(text)
+    last = len(segments) - 1
+    return ''.join(
+        segment.zfill(CODE_SEGMENT_WIDTH)
+        if segment.isdigit() and not (partial and i == last) else segment
+        for i, segment in enumerate(segments)
+    )
+
+
+def deletions(code):
+    """代码本身及删去一个字符的所有变体（编辑距离 1 的删除邻域）"""
+    variants = {code}
+    for i in range(len(code)):
+        variants.add(code[:i] + code[i + 1:])
+    return variants
+
+
+def within_one_edit(a, b):
+    """a、b 的编辑距离（插入、删除、替换、相邻交换）是否不超过 1"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        # 替换一个字符，或交换相邻两个字符
+        return a[i + 1:] == b[i + 1:] or (
+            i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+        )
+    # b 比 a 多一个字符
+    return a[i:] == b[i + 1:]
@@ -0,0 +1,165 @@
+"""Component IO Check 记录索引
+
+每个 JSON 文件（{"title": ..., "data": [记录, ...]}）解析一次后建立索引：
+name/module/desc 按空白切分的小写词表 → 记录编号，以及 module、level、cyclic
+的取值 → 记录编号。查询词同样按空白切分，逐词在词表中做子串匹配后求交集，
+结果与前端按 name/desc/module 做 includes 过滤一致，但只返回需要的那一页。
+子串匹配用词表的后缀数组：包含某个词的词，必有一个后缀以它开头，
+二分查找即可，不需要扫描整个词表。
+索引以文件路径为键缓存，文件 mtime/大小变化后重建；不同文件可以并行构建。
+"""
+import json
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+from config.metrics import register_stats
+
+from .cache import SizedLRUCache
+
+TEXT_FIELDS = ('name', 'module', 'desc')
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+class ComponentIndex:
+    """单个 Component IO Check 文件的记录索引"""
+
+    def __init__(self, payload):
+        if isinstance(payload, dict):
+            self.title = payload.get('title', '')
+            records = payload.get('data') or []
+        else:
+            self.title = ''
+            records = payload
+        self.records = [r for r in records if isinstance(r, dict)]
+
+        vocab = {}
+        modules = {}
+        levels = {}
+        cyclic = set()
+        for i, record in enumerate(self.records):
+            tokens = set()
+            for field in TEXT_FIELDS:
+                tokens.update(_text(record.get(field)).lower().split())
+            for token in tokens:
+                vocab.setdefault(token, []).append(i)
+            modules.setdefault(_text(record.get('module')).lower(), []).append(i)
+            levels.setdefault(_text(record.get('level')).lower(), []).append(i)
+            if record.get('cyclic'):
+                cyclic.add(i)
+        self.modules = modules
+        self.levels = levels
+        self.cyclic = cyclic
+
+        # 后缀数组：词表用 '\0' 连接成一个字符串，suffix_array 为所有后缀的起点，
+        # 按起点到所在词结尾的子串升序排列；suffix_tokens 为对应的词编号
+        tokens = list(vocab)
+        self.postings = [vocab[token] for token in tokens]
+        self.text = text = '\0'.join(tokens) + '\0'
+        suffixes = []
+        positions = array('i')
+        owners = array('i')
+        pos = 0
+        for n, token in enumerate(tokens):
+            for i in range(len(token)):
+                suffixes.append(token[i:])
+                positions.append(pos + i)
+                owners.append(n)
+            pos += len(token) + 1
+        order = sorted(range(len(suffixes)), key=suffixes.__getitem__)
+        self.suffix_array = array('i', (positions[k] for k in order))
+        self.suffix_tokens = array('i', (owners[k] for k in order))
+        self.suffix_bytes = sys.getsizeof(text) + 2 * self.suffix_array.itemsize * len(order)
+
+    def _term_ids(self, term):
+        """包含 term 的词对应的记录编号：以 term 开头的后缀在后缀数组中是连续的一段"""
+        text = self.text
+        length = len(term)
+
+        def prefix(k):
+            # 后缀的前 length 个字符，不跨过词尾；截断不改变后缀数组的顺序
+            end = text.find('\0', k, k + length)
+            return text[k:k + length if end < 0 else end]
+
+        lo = bisect_left(self.suffix_array, term, key=prefix)
+        hi = bisect_right(self.suffix_array, term, lo=lo, key=prefix)
+        ids = set()
+        for n in set(self.suffix_tokens[lo:hi]):
+            ids.update(self.postings[n])
+        return ids
+
+    def query(self, q='', module='', level='', cyclic=None):
+        """返回按原顺序排列的匹配记录编号"""
+        sets = []
+        if module:
+            sets.append(set(self.modules.get(module.lower(), ())))
+        if level:
+            sets.append(set(self.levels.get(level.lower(), ())))
+        if cyclic is not None:
+            sets.append(self.cyclic if cyclic else set(range(len(self.records))) - self.cyclic)
+        for term in q.lower().split():
+            sets.append(self._term_ids(term))
+        if not sets:
+            return list(range(len(self.records)))
+        sets.sort(key=len)
+        ids = set(sets[0])
+        for other in sets[1:]:
+            ids &= other
+            if not ids:
+                break
+        return sorted(ids)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+# 每个文件一把构建锁：同一文件只解析一次，不同文件的构建互不阻塞
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def get_index_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_bytes = getattr(settings, 'COMPONENT_INDEX_CACHE_MAX_BYTES', 128 * 1024 * 1024)
+                # 大文件正是最需要缓存的，只要不超过总限额就缓存
+                _cache = SizedLRUCache(max_bytes, max_item_bytes=max_bytes)
+    return _cache
+
+
+register_stats('component_index_cache', lambda: get_index_cache().stats())
+
+
+def _build_lock(key):
+    with _build_locks_lock:
+        lock = _build_locks.get(key)
+        if lock is None:
+            lock = _build_locks[key] = threading.Lock()
+    return lock
+
+
+def get_component_index(json_path):
+    """返回文件的记录索引；文件不存在时返回 None，JSON 格式错误时抛出 ValueError"""
+    try:
+        st = json_path.stat()
+    except OSError:
+        return None
+    version = (st.st_mtime_ns, st.st_size)
+    cache = get_index_cache()
+    index = cache.get(str(json_path), version)
+    if index is not None:
+        return index
+    with _build_lock(str(json_path)):
+        index = cache.get(str(json_path), version)
+        if index is None:
+            index = ComponentIndex(json.loads(json_path.read_text(encoding='utf-8')))
+            # 解析后的记录约占原文件大小的数倍，按 4 倍估算，再加上后缀表
+            cache.put(str(json_path), version, index, st.st_size * 4 + index.suffix_bytes)
+    return index
@@ -0,0 +1,214 @@
+"""MP4 moov 前置（faststart）
+
+手机录制的 MP4 常把 moov（索引）写在文件末尾，浏览器要先 Range 请求文件尾部才能开始播放。
+这里解析顶层 box，把 moov 移到第一个 mdat 之前，并修正 stco/co64 中的分片偏移量；
+mdat 等数据部分通过 copy_file_range / sendfile 按区间拷贝，不读入内存。
+偏移量超出 32 位时把 stco 升级为 co64。只依赖标准库，不需要 ffmpeg。
+"""
+import errno
+import os
+import struct
+import threading
+
+FASTSTART_EXTENSIONS = {'.mp4', '.m4v', '.mov'}
+
+# 从 moov 到 stco/co64 路径上需要展开的容器 box
+CONTAINER_TYPES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+_COPY_FALLBACK_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP}
+
+
+def iter_top_boxes(fd, file_size):
+    """遍历顶层 box，产出 (类型, 偏移, 头长度, 总长度)"""
+    pos = 0
+    while pos + 8 <= file_size:
+        size, box_type = struct.unpack('>I4s', os.pread(fd, 8, pos))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', os.pread(fd, 8, pos + 8))[0]
+            header = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header or pos + size > file_size:
+            raise ValueError(f'Invalid box at offset {pos}')
+        yield box_type, pos, header, size
+        pos += size
+
+
+def parse_boxes(data):
+    """把 box 序列解析为 [类型, 子 box 列表或原始内容] 的列表"""
+    boxes = []
+    pos = 0
+    while pos + 8 <= len(data):
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = len(data) - pos
+        if size < header or pos + size > len(data):
+            raise ValueError(f'Invalid {box_type!r} box')
+        payload = data[pos + header:pos + size]
+        boxes.append([box_type, parse_boxes(payload) if box_type in CONTAINER_TYPES else payload])
+        pos += size
+    return boxes
+
+
+def _serialize(boxes):
+    out = []
+    for box_type, content in boxes:
+        payload = _serialize(content) if isinstance(content, list) else content
+        if len(payload) + 8 <= 0xFFFFFFFF:
+            out.append(struct.pack('>I4s', len(payload) + 8, box_type))
+        else:
+            out.append(struct.pack('>I4sQ', 1, box_type, len(payload) + 16))
+        out.append(payload)
+    return b''.join(out)
+
+
+def _offset_tables(boxes):
+    """找出所有 stco/co64，产出 (box, 偏移量列表)"""
+    for box in boxes:
+        box_type, content = box
+        if isinstance(content, list):
+            yield from _offset_tables(content)
+        elif box_type in (b'stco', b'co64'):
+            count = struct.unpack_from('>I', content, 4)[0]
+            fmt = '>%d%s' % (count, 'I' if box_type == b'stco' else 'Q')
+            if 8 + struct.calcsize(fmt) > len(content):
+                raise ValueError(f'Truncated {box_type!r} box')
+            yield box, list(struct.unpack_from(fmt, content, 8))
+
+
+def _copy_range(src_fd, dst_fd, offset, count):
+    """把 src_fd 中 [offset, offset+count) 追加写到 dst_fd"""
+    end = offset + count
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while offset < end:
+                n = os.copy_file_range(src_fd, dst_fd, end - offset, offset)
+                if n == 0:
+                    raise ValueError('Unexpected end of file')
+                offset += n
+            return
+        except OSError as e:
+            if e.errno not in _COPY_FALLBACK_ERRORS:
+                raise
+    if hasattr(os, 'sendfile'):
+        try:
+            while offset < end:
+                n = os.sendfile(dst_fd, src_fd, offset, end - offset)
+                if n == 0:
+                    raise ValueError('Unexpected end of file')
+                offset += n
+            return
+        except OSError as e:
+            if e.errno not in _COPY_FALLBACK_ERRORS:
+                raise
+    while offset < end:
+        data = os.pread(src_fd, min(end - offset, 1024 * 1024), offset)
+        if not data:
+            raise ValueError('Unexpected end of file')
+        view = memoryview(data)
+        while view:
+            view = view[os.write(dst_fd, view):]
+        offset += len(data)
+
+
+def build_moov(moov_payload, insert_at, moov_offset, moov_size):
+    """生成移动后的 moov，返回其字节内容
+
+    原文件中 [insert_at, moov_offset) 的数据后移新 moov 的长度，moov 之后的数据
+    偏移量变化为新旧 moov 的长度差，insert_at 之前的不变。
+    """
+    tree = parse_boxes(moov_payload)
+    if any(box_type == b'cmov' for box_type, _content in tree):
+        raise ValueError('Compressed moov is not supported')
+    tables = list(_offset_tables(tree))
+    moov_end = moov_offset + moov_size
+
+    new_size = len(_serialize([[b'moov', tree]]))
+    while True:
+        def shift(offset):
+            if insert_at <= offset < moov_offset:
+                return offset + new_size
+            if offset >= moov_end:
+                return offset + new_size - moov_size
+            return offset
+
+        for box, offsets in tables:
+            shifted = [shift(o) for o in offsets]
+            if box[0] == b'stco' and shifted and max(shifted) > 0xFFFFFFFF:
+                box[0] = b'co64'
+            fmt = '>%d%s' % (len(shifted), 'I' if box[0] == b'stco' else 'Q')
+            box[1] = box[1][:8] + struct.pack(fmt, *shifted)
+        moov_bytes = _serialize([[b'moov', tree]])
+        if len(moov_bytes) == new_size:
+            return moov_bytes
+        # stco 升级为 co64 后 moov 变大，按新长度重新计算
+        new_size = len(moov_bytes)
+
+
+def needs_faststart(path):
+    """moov 位于第一个 mdat 之后时返回 True；不是 MP4 时抛出 ValueError"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        boxes = list(iter_top_boxes(fd, os.fstat(fd).st_size))
+    finally:
+        os.close(fd)
+    moov = next((b for b in boxes if b[0] == b'moov'), None)
+    mdat = next((b for b in boxes if b[0] == b'mdat'), None)
+    if moov is None or mdat is None:
+        raise ValueError('Not an MP4 file')
+    return moov[1] > mdat[1]
+
+
+def faststart(path):
+    """把 MP4 的 moov 移到 mdat 之前，返回是否改写了文件
+
+    先写同目录下的临时文件，再原子替换原文件；处理期间原文件被修改则放弃。
+    不是可处理的 MP4 时抛出 ValueError。
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        st = os.fstat(fd)
+        boxes = list(iter_top_boxes(fd, st.st_size))
+        moov = next((b for b in boxes if b[0] == b'moov'), None)
+        mdat = next((b for b in boxes if b[0] == b'mdat'), None)
+        if moov is None or mdat is None:
+            raise ValueError('Not an MP4 file')
+        if moov[1] < mdat[1]:
+            return False
+
+        _type, moov_offset, moov_header, moov_size = moov
+        insert_at = mdat[1]
+        moov_bytes = build_moov(
+            os.pread(fd, moov_size - moov_header, moov_offset + moov_header),
+            insert_at, moov_offset, moov_size,
+        )
+
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.faststart')
+        out = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, st.st_mode & 0o777)
+        try:
+            _copy_range(fd, out, 0, insert_at)
+            view = memoryview(moov_bytes)
+            while view:
+                view = view[os.write(out, view):]
+            _copy_range(fd, out, insert_at, moov_offset - insert_at)
+            _copy_range(fd, out, moov_offset + moov_size, st.st_size - moov_offset - moov_size)
+            os.fsync(out)
+        except BaseException:
+            os.close(out)
+            os.unlink(tmp)
+            raise
+        os.close(out)
+
+        current = os.stat(path)
+        if (current.st_mtime_ns, current.st_size) != (st.st_mtime_ns, st.st_size):
+            os.unlink(tmp)
+            return False
+        os.replace(tmp, path)
+        return True
+    finally:
+        os.close(fd)
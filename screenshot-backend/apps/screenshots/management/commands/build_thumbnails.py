@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.screenshots.catalog import get_catalog
+from apps.screenshots.thumbnails import IMAGE_EXTENSIONS, submit_thumbnail, thumbnail_rel_path
+
+
+class Command(BaseCommand):
+    help = '批量预生成截图缩略图（已生成且未过期的跳过）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', default='Error Code', help='只处理该模式目录，默认 Error Code')
+        parser.add_argument('--brand', default='', help='只处理该品牌目录')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='生成进程数')
+
+    def handle(self, *args, **options):
+        parts = [options['mode']] + ([options['brand']] if options['brand'] else [])
+        catalog = get_catalog()
+        if not catalog.exists(*parts):
+            self.stderr.write(f'Directory not found: {"/".join(parts)}')
+            return
+
+        built = skipped = failed = 0
+        pool = ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+        futures = {}
+        with pool:
+            for rel_path, filename in catalog.iter_files(*parts, recursive=True):
+                if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+                    continue
+                try:
+                    st = os.stat(settings.SCREENSHOTS_ROOT / rel_path)
+                except OSError:
+                    continue
+                if (settings.THUMBNAIL_ROOT / thumbnail_rel_path(rel_path, st)).exists():
+                    skipped += 1
+                    continue
+                _thumb_rel, future = submit_thumbnail(rel_path, st, pool=pool)
+                futures[future] = rel_path
+
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    built += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {e}')
+                done = built + failed
+                if done % 500 == 0:
+                    self.stdout.write(f'{done}/{len(futures)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Thumbnails built: {built}, up to date: {skipped}, failed: {failed}'
+        ))
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.screenshots.catalog import get_catalog
+from apps.screenshots.faststart import FASTSTART_EXTENSIONS, faststart, needs_faststart
+
+
+class Command(BaseCommand):
+    help = '批量把视频库中 MP4 的 moov 移到文件开头（已处理的跳过）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--brand', default='', help='只处理该品牌目录')
+        parser.add_argument('--workers', type=int, default=4, help='并行处理的线程数')
+        parser.add_argument('--dry-run', action='store_true', help='只统计需要处理的文件')
+
+    def handle(self, *args, **options):
+        parts = ['Video Tutorial'] + ([options['brand']] if options['brand'] else [])
+        catalog = get_catalog()
+        if not catalog.exists(*parts):
+            self.stderr.write(f'Directory not found: {"/".join(parts)}')
+            return
+
+        paths = []
+        linked = 0
+        for rel_path, filename in catalog.iter_files(*parts, recursive=True):
+            if os.path.splitext(filename)[1].lower() not in FASTSTART_EXTENSIONS:
+                continue
+            path = settings.SCREENSHOTS_ROOT / rel_path
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            # 与 blob 或其他视频共享数据的硬链接：改写会生成新文件、断开链接，跳过
+            if st.st_nlink > 1:
+                linked += 1
+                continue
+            paths.append(path)
+        task = needs_faststart if options['dry_run'] else faststart
+
+        changed = skipped = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {pool.submit(task, path): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    if future.result():
+                        changed += 1
+                    else:
+                        skipped += 1
+                except (OSError, ValueError) as e:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {e}')
+
+        action = 'Need faststart' if options['dry_run'] else 'Processed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: {changed}, already faststart: {skipped}, failed: {failed}, '
+            f'skipped hardlinked: {linked}'
+        ))
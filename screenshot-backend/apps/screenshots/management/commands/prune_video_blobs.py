@@ -0,0 +1,42 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from apps.screenshots.blobs import blob_root
+
+
+class Command(BaseCommand):
+    help = '清理内容寻址存储中已无视频引用的 blob（硬链接数为 1）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不删除')
+
+    def handle(self, *args, **options):
+        root = blob_root()
+        if not root.exists():
+            self.stdout.write('No blob store')
+            return
+
+        removed = kept = freed = 0
+        for dirpath, _dirnames, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_nlink > 1:
+                    kept += 1
+                    continue
+                if not options['dry_run']:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        continue
+                removed += 1
+                freed += st.st_size
+
+        action = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {removed} blobs ({freed / 1024 / 1024:.1f} MB), kept {kept}'
+        ))
@@ -0,0 +1,365 @@
+"""型号目录的 n-gram 关键词索引
+
+对每个型号目录下图片文件名（小写 stem）建立 1~3 字符的 n-gram 倒排表，
+子串查询时取关键词的 n-gram 倒排表求交集，再对候选做一次子串校验。
+条目按 (name, 路径) 排序后编号，结果按编号输出即为最终顺序，分页时无需再排序。
+同时按归一化代码（见 codes.py）建立有序表和编辑距离 1 的删除邻域表，
+搜索结果按 精确 → 前缀 → 包含 → 容错 分层排序。
+GlobalIndex 把一个模式（或品牌）下各型号的索引组合起来，用于不指定型号的全局搜索。
+"""
+import base64
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from array import array
+from itertools import islice
+
+from config.metrics import count
+
+from .catalog import get_catalog
+from .codes import FUZZY_MIN_LENGTH, deletions, normalize_code, within_one_edit
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+
+GRAM_SIZE = 3
+
+# 匹配类型，顺序即结果排序（层级）
+MATCH_TYPES = ('exact', 'prefix', 'contains', 'fuzzy')
+
+
+def _grams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class NgramIndex:
+    """单个型号目录的子串索引"""
+
+    # 非精确候选不超过该数量时逐条校验得到精确总数，否则按抽样比例估算
+    EXACT_TOTAL_LIMIT = 5000
+
+    def __init__(self, entries):
+        # entries: [(name, filename, rel_path)]，按 (name, rel_path) 排序，编号即结果顺序
+        self.entries = sorted(entries, key=sort_key)
+        self.keys = [e[0].lower() for e in self.entries]
+        postings = {}
+        for i, key in enumerate(self.keys):
+            grams = set()
+            for size in range(1, GRAM_SIZE + 1):
+                grams |= _grams(key, size)
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('i')
+                posting.append(i)
+        self.postings = postings
+
+        # 归一化代码：按代码排序的编号用于精确/前缀查找（二分）
+        self.codes = [normalize_code(e[0]) for e in self.entries]
+        self.code_order = array('i', sorted(range(len(self.codes)), key=self.codes.__getitem__))
+        self.sorted_codes = [self.codes[i] for i in self.code_order]
+        # 删除邻域：每个变体存成一个整数 (哈希 << id_bits) | 编号，排序后二分查找
+        self.id_bits = max(len(self.codes).bit_length(), 1)
+        hash_mask = (1 << (63 - self.id_bits)) - 1
+        self.variants = array('q', sorted(
+            ((hash(variant) & hash_mask) << self.id_bits) | i
+            for i, code in enumerate(self.codes) if len(code) >= FUZZY_MIN_LENGTH - 1
+            for variant in deletions(code)
+        ))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _candidates(self, keyword):
+        """返回 (升序候选编号, 是否无需校验)"""
+        if not keyword:
+            return range(len(self.entries)), True
+        size = min(len(keyword), GRAM_SIZE)
+        lists = []
+        for gram in _grams(keyword, size):
+            posting = self.postings.get(gram)
+            if posting is None:
+                return [], True
+            lists.append(posting)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for posting in lists[1:]:
+            n = len(posting)
+            kept = []
+            for i in candidates:
+                pos = bisect_left(posting, i)
+                if pos < n and posting[pos] == i:
+                    kept.append(i)
+            candidates = kept
+            if not candidates:
+                return [], True
+        # 关键词本身不长于 n-gram 时倒排表即精确结果
+        return candidates, len(keyword) <= GRAM_SIZE
+
+    def search_ids(self, keyword):
+        """返回包含 keyword（不区分大小写）的条目编号，升序"""
+        keyword = keyword.lower()
+        candidates, exact = self._candidates(keyword)
+        if exact:
+            return list(candidates)
+        keys = self.keys
+        return [i for i in candidates if keyword in keys[i]]
+
+    def search(self, keyword):
+        return [self.entries[i] for i in self.search_ids(keyword)]
+
+    def _code_range(self, code, prefix=False):
+        """归一化代码等于（prefix 时为以其开头）code 的条目编号，升序"""
+        lo = bisect_left(self.sorted_codes, code)
+        if prefix:
+            hi = bisect_left(self.sorted_codes, code + '\U0010ffff', lo)
+        else:
+            hi = bisect_right(self.sorted_codes, code, lo)
+        return sorted(self.code_order[lo:hi])
+
+    def _fuzzy_ids(self, code):
+        """归一化代码与 code 编辑距离不超过 1 的条目编号，升序
+
+        两个字符串编辑距离为 1 时，各自的删除邻域必有交集，只需查 code 的 len(code)+1 个变体，
+        耗时与条目数无关（每个变体一次二分）。哈希冲突的候选由 within_one_edit 排除。
+        """
+        variants = self.variants
+        bits = self.id_bits
+        hash_mask = (1 << (63 - bits)) - 1
+        id_mask = (1 << bits) - 1
+        ids = set()
+        for variant in deletions(code):
+            base = (hash(variant) & hash_mask) << bits
+            lo = bisect_left(variants, base)
+            hi = bisect_left(variants, base + (1 << bits), lo)
+            ids.update(packed & id_mask for packed in variants[lo:hi])
+        codes = self.codes
+        return sorted(i for i in ids if within_one_edit(code, codes[i]))
+
+    def _code_tiers(self, keyword):
+        """按归一化代码匹配，返回 (精确, 前缀, 容错) 三个互不重叠的升序编号列表"""
+        code = normalize_code(keyword)
+        if not code:
+            return [], [], []
+        exact = self._code_range(code)
+        seen = set(exact)
+        prefix = [i for i in self._code_range(normalize_code(keyword, partial=True), prefix=True)
+                  if i not in seen]
+        fuzzy = []
+        if len(code) >= FUZZY_MIN_LENGTH:
+            seen.update(prefix)
+            fuzzy = [i for i in self._fuzzy_ids(code) if i not in seen]
+        return exact, prefix, fuzzy
+
+    def search_page(self, keyword, after=None, limit=50):
+        """返回排在 after（cursor_key）之后的前 limit 条匹配
+
+        结果按层排序：归一化代码相同（exact）、归一化代码前缀（prefix）、
+        文件名包含关键词（contains）、归一化代码编辑距离为 1（fuzzy），
+        同一层内按编号即 (name, 路径) 排序，每层都只需从游标位置顺序扫描。
+        返回 ([(匹配类型, 条目)], 总数, 总数是否精确, 下一页的 after，没有下一页时为 None)。
+        """
+        lowered = keyword.lower()
+        exact, prefix, fuzzy = self._code_tiers(keyword)
+        ranked = set(exact)
+        ranked.update(prefix)
+        candidates, verified = self._candidates(lowered)
+        keys = self.keys
+        # 已在 contains 层出现的不再算作容错匹配
+        fuzzy = [i for i in fuzzy if lowered not in keys[i]]
+
+        def contains(i):
+            return i not in ranked and (verified or lowered in keys[i])
+
+        start_rank, start = 0, 0
+        if after is not None:
+            start_rank = after[0]
+            start = bisect_right(self.entries, tuple(after[1:]), key=sort_key)
+
+        page = []
+        for rank, (ids, check) in enumerate(((exact, None), (prefix, None), (candidates, contains), (fuzzy, None))):
+            if rank < start_rank:
+                continue
+            pos = bisect_left(ids, start) if rank == start_rank else 0
+            for i in islice(ids, pos, None):
+                if check is None or check(i):
+                    page.append((rank, i))
+                    if len(page) > limit:
+                        break
+            if len(page) > limit:
+                break
+        next_after = None
+        if len(page) > limit:
+            page = page[:limit]
+            rank, i = page[-1]
+            next_after = (rank, *sort_key(self.entries[i]))
+
+        contains_total, total_exact = self._count_contains(candidates, verified, lowered, ranked)
+        total = len(exact) + len(prefix) + contains_total + len(fuzzy)
+        entries = self.entries
+        return [(MATCH_TYPES[rank], entries[i]) for rank, i in page], total, total_exact, next_after
+
+    def _count_contains(self, candidates, verified, lowered, ranked):
+        """contains 层的条目数（不含已在精确/前缀层的条目），返回 (数量, 是否精确)"""
+        keys = self.keys
+        if verified:
+            # 候选即全部包含关键词的条目
+            return len(candidates) - sum(1 for i in ranked if lowered in keys[i]), True
+        if len(candidates) <= self.EXACT_TOTAL_LIMIT:
+            return sum(1 for i in candidates if i not in ranked and lowered in keys[i]), True
+        sample = candidates[:self.EXACT_TOTAL_LIMIT]
+        hits = sum(1 for i in sample if i not in ranked and lowered in keys[i])
+        return round(hits / len(sample) * len(candidates)), False
+
+    def match(self, keyword):
+        """全部匹配，按 search_page 的顺序，返回 [(匹配类型, 条目)]"""
+        return self.search_page(keyword, limit=len(self.entries))[0]
+
+
+def sort_key(entry):
+    """层内排序键：(name, rel_path)"""
+    return entry[0], entry[2]
+
+
+def encode_cursor(key):
+    """把游标位置（层级, name, rel_path）编码为不透明的游标字符串"""
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        rank, name, rel_path = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if (not isinstance(rank, int) or not 0 <= rank < len(MATCH_TYPES)
+            or not isinstance(name, str) or not isinstance(rel_path, str)):
+        raise ValueError('Invalid cursor')
+    return rank, name, rel_path
+
+
+def linear_search(entries, keyword):
+    """线性扫描（与索引结果对照用）"""
+    keyword = keyword.lower()
+    return sorted((e for e in entries if keyword in e[0].lower()), key=sort_key)
+
+
+def linear_match(entries, keyword):
+    """逐条计算匹配类型（与 NgramIndex.match 结果对照用）"""
+    code = normalize_code(keyword)
+    partial = normalize_code(keyword, partial=True)
+    lowered = keyword.lower()
+    results = []
+    for entry in entries:
+        entry_code = normalize_code(entry[0])
+        if code and entry_code == code:
+            rank = 0
+        elif code and entry_code.startswith(partial):
+            rank = 1
+        elif lowered in entry[0].lower():
+            rank = 2
+        elif len(code) >= FUZZY_MIN_LENGTH and within_one_edit(code, entry_code):
+            rank = 3
+        else:
+            continue
+        results.append((rank, sort_key(entry), entry))
+    results.sort(key=lambda r: r[:2])
+    return [(MATCH_TYPES[rank], entry) for rank, _key, entry in results]
+
+
+def collect_entries(catalog, *parts):
+    """从目录索引中收集型号目录下的图片条目"""
+    entries = []
+    for rel_path, filename in catalog.iter_files(*parts, recursive=True):
+        stem, suffix = os.path.splitext(filename)
+        if suffix.lower() in IMAGE_EXTENSIONS:
+            entries.append((stem, filename, rel_path))
+    return entries
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_model_index(mode, brand, model):
+    """返回型号目录的索引，目录内容变化（子树版本号变化）后自动重建"""
+    catalog = get_catalog()
+    key = (mode, brand, model)
+    version = catalog.version(*key)
+    if version is None:
+        return None
+    cached = _indexes.get(key)
+    if cached is not None and cached[0] is catalog and cached[1] == version:
+        return cached[2]
+    with _indexes_lock:
+        cached = _indexes.get(key)
+        if cached is not None and cached[0] is catalog and cached[1] == version:
+            return cached[2]
+        index = NgramIndex(collect_entries(catalog, *key))
+        count('files_scanned', len(index))
+        _indexes[key] = (catalog, version, index)
+    return index
+
+
+class GlobalIndex:
+    """跨型号索引：一个模式（或其中一个品牌）下全部型号目录的索引
+
+    由各型号的 NgramIndex 组成，型号索引仍由 get_model_index 缓存，
+    某个型号目录变化时只重建该型号的索引，跨型号索引只需重新组装型号列表。
+    """
+
+    def __init__(self, groups):
+        # groups: [(brand, model, NgramIndex)]，按 (brand, model) 排序
+        self.groups = groups
+
+    def __len__(self):
+        return sum(len(index) for _brand, _model, index in self.groups)
+
+    def search_groups(self, keyword, per_group=5, max_groups=None):
+        """按型号分组搜索
+
+        每组返回前 per_group 条匹配，分组按组内最好的匹配类型排序（同类型按品牌、型号），
+        最多返回 max_groups 组（总数仍统计全部分组）。
+        返回 ([(brand, model, [(匹配类型, 条目)], 总数, 总数是否精确, 下一页的 after)], 有匹配的分组数, 匹配总数)。
+        """
+        groups = []
+        total = 0
+        for brand, model, index in self.groups:
+            page, group_total, exact, next_after = index.search_page(keyword, limit=per_group)
+            if page:
+                total += group_total
+                groups.append((brand, model, page, group_total, exact, next_after))
+        groups.sort(key=lambda group: MATCH_TYPES.index(group[2][0][0]))
+        return groups[:max_groups], len(groups), total
+
+
+_global_indexes = {}
+_global_lock = threading.Lock()
+
+
+def get_global_index(mode, brand=None):
+    """返回模式（指定 brand 时为该品牌）下的跨型号索引，子树版本号变化后重新组装"""
+    catalog = get_catalog()
+    key = (mode, brand) if brand else (mode,)
+    version = catalog.version(*key)
+    if version is None:
+        return None
+    cached = _global_indexes.get(key)
+    if cached is not None and cached[0] is catalog and cached[1] == version:
+        return cached[2]
+    with _global_lock:
+        cached = _global_indexes.get(key)
+        if cached is not None and cached[0] is catalog and cached[1] == version:
+            return cached[2]
+        groups = []
+        brands = [brand] if brand else catalog.list_dirs(mode, exclude={'data'})
+        for brand_name in brands:
+            for model in catalog.list_dirs(mode, brand_name, exclude={'data'}):
+                index = get_model_index(mode, brand_name, model)
+                if index is not None and len(index):
+                    groups.append((brand_name, model, index))
+        index = GlobalIndex(groups)
+        _global_indexes[key] = (catalog, version, index)
+    return index
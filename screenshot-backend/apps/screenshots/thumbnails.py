@@ -0,0 +1,152 @@
+"""搜索结果缩略图
+
+缩略图按原图相对路径镜像存放在 THUMBNAIL_ROOT 下，文件名带上原图的
+mtime 和大小（如 005-120.jpg.18c1f2a3b4c5d6e7-1a2b.webp），原图替换后自动失效。
+搜索结果中的缩略图地址都指向 ThumbnailView，由它按需在进程池中生成并跳转到静态文件，
+也可以用 `python manage.py build_thumbnails` 批量预生成。
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+from .search_index import IMAGE_EXTENSIONS
+
+_FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def build_thumbnail(src, dest, width, fmt, quality):
+    """生成单张缩略图（在子进程中执行），返回 dest"""
+    from PIL import Image, ImageOps
+
+    dest = Path(dest)
+    try:
+        with Image.open(src) as im:
+            # JPEG 解码时直接按比例缩小，大图省去大部分解码开销
+            im.draft('RGB', (width, max(1, im.height * width // max(1, im.width))))
+            im = ImageOps.exif_transpose(im)
+            if im.width > width:
+                height = max(1, round(im.height * width / im.width))
+                im = im.resize((width, height), Image.LANCZOS)
+            if fmt == 'JPEG' and im.mode != 'RGB':
+                im = im.convert('RGB')
+            elif fmt == 'WEBP' and im.mode not in ('RGB', 'RGBA'):
+                im = im.convert('RGBA' if 'A' in im.getbands() or 'transparency' in im.info else 'RGB')
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(f'{dest.name}.{os.getpid()}.tmp')
+            try:
+                im.save(tmp, format=fmt, quality=quality)
+                os.replace(tmp, dest)
+            except Exception:
+                tmp.unlink(missing_ok=True)
+                raise
+    except Image.DecompressionBombError as e:
+        # 超大图片，按无法解码处理
+        raise ValueError(str(e))
+
+    # 清理同一原图的旧版本缩略图
+    name = Path(src).name
+    for sibling in dest.parent.glob(glob_escape(name) + '.*'):
+        if sibling != dest and not sibling.name.endswith('.tmp') and sibling.name.rsplit('.', 2)[0] == name:
+            try:
+                sibling.unlink()
+            except OSError:
+                pass
+    return str(dest)
+
+
+def glob_escape(name):
+    return ''.join(f'[{c}]' if c in '*?[' else c for c in name)
+
+
+@lru_cache(maxsize=None)
+def _webp_supported():
+    from PIL import features
+    return features.check('webp')
+
+
+def thumbnail_format():
+    """THUMBNAIL_FORMAT，Pillow 不支持 WebP 时退回 JPEG"""
+    fmt = getattr(settings, 'THUMBNAIL_FORMAT', 'WEBP').upper()
+    if fmt == 'WEBP' and not _webp_supported():
+        fmt = 'JPEG'
+    return fmt
+
+
+def thumbnail_rel_path(rel_path, st):
+    """缩略图相对 THUMBNAIL_ROOT 的路径，由原图路径、mtime 和大小决定"""
+    ext = _FORMAT_EXTENSIONS[thumbnail_format()]
+    width = settings.THUMBNAIL_WIDTH
+    return f'{width}/{rel_path}.{st.st_mtime_ns:x}-{st.st_size:x}.{ext}'
+
+
+def thumbnail_url(rel_path):
+    """搜索结果中的缩略图地址，始终指向懒生成接口（已生成时由接口跳转到静态文件）
+
+    不在这里 stat 原图和缩略图：不分页的搜索一次可能返回上千条结果。
+    """
+    return '/api/screenshots/thumbnail/?' + urlencode({'path': rel_path})
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                # gunicorn worker 是多线程进程，用 spawn 避免 fork 带来的锁问题
+                _pool = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def submit_thumbnail(rel_path, st, pool=None):
+    """提交生成任务，返回 (缩略图相对路径, future)；同一缩略图的并发请求共用一个任务"""
+    thumb_rel = thumbnail_rel_path(rel_path, st)
+    dest = settings.THUMBNAIL_ROOT / thumb_rel
+    pool = pool or get_pool()
+    with _pending_lock:
+        future = _pending.get(dest)
+        if future is None:
+            future = pool.submit(
+                build_thumbnail,
+                str(settings.SCREENSHOTS_ROOT / rel_path),
+                str(dest),
+                settings.THUMBNAIL_WIDTH,
+                thumbnail_format(),
+                getattr(settings, 'THUMBNAIL_QUALITY', 75),
+            )
+            _pending[dest] = future
+            future.add_done_callback(lambda f: _pending.pop(dest, None))
+    return thumb_rel, future
+
+
+def ensure_thumbnail(rel_path):
+    """确保缩略图存在（必要时生成），返回缩略图相对路径；原图不存在时返回 None
+
+    最多等待 THUMBNAIL_TIMEOUT 秒，超时抛出 concurrent.futures.TimeoutError，生成任务继续执行。
+    """
+    try:
+        st = os.stat(settings.SCREENSHOTS_ROOT / rel_path)
+    except OSError:
+        return None
+    thumb_rel = thumbnail_rel_path(rel_path, st)
+    if (settings.THUMBNAIL_ROOT / thumb_rel).exists():
+        return thumb_rel
+    thumb_rel, future = submit_thumbnail(rel_path, st)
+    future.result(timeout=getattr(settings, 'THUMBNAIL_TIMEOUT', 5))
+    return thumb_rel
@@ -0,0 +1,99 @@
+"""上传 token（upload. 子域名使用）
+
+token 格式为 base64url(JSON 载荷) + '.' + base64url(HMAC-SHA256 签名)，
+载荷包含用户 ID、用户名、用途（scope）和过期时间。分片接口只校验签名和过期时间，
+不查数据库；只有合并（以及流式上传完成）时才需要真实的用户对象，
+通过 resolve_upload_user 获取，并在进程内短时间缓存。
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+from django.conf import settings
+
+from apps.users.models import User
+
+UPLOAD_SCOPE = 'video-upload'
+
+
+class UploadTokenUser:
+    """token 中携带的用户信息，提供分片接口用到的 id/username 属性"""
+
+    def __init__(self, user_id, username, scope):
+        self.id = user_id
+        self.username = username
+        self.scope = scope
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signing_key():
+    return hashlib.sha256(b'upload-token:' + settings.SECRET_KEY.encode()).digest()
+
+
+def _sign(payload):
+    return hmac.new(_signing_key(), payload.encode('ascii'), hashlib.sha256).digest()
+
+
+def make_upload_token(user, scope=UPLOAD_SCOPE, ttl=None):
+    """生成上传 token，返回 (token, 过期时间戳)"""
+    if ttl is None:
+        ttl = getattr(settings, 'UPLOAD_TOKEN_TTL', 3600)
+    expires = int(time.time()) + ttl
+    payload = _b64encode(json.dumps(
+        {'uid': user.id, 'un': user.username, 'scope': scope, 'exp': expires},
+        separators=(',', ':'),
+    ).encode())
+    return f'{payload}.{_b64encode(_sign(payload))}', expires
+
+
+def verify_upload_token(token, scope=UPLOAD_SCOPE):
+    """校验 token 的签名、用途和过期时间，返回 UploadTokenUser 或 None（不查数据库）"""
+    try:
+        payload, signature = token.split('.')
+        if not hmac.compare_digest(_b64decode(signature), _sign(payload)):
+            return None
+        data = json.loads(_b64decode(payload))
+        if data['scope'] != scope or time.time() > data['exp']:
+            return None
+        return UploadTokenUser(int(data['uid']), str(data['un']), data['scope'])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+_user_cache = {}  # user_id -> (过期时间, User)
+_user_cache_lock = threading.Lock()
+
+
+def resolve_upload_user(user):
+    """返回 token 用户对应的 User；用户已删除或被禁用时返回 None
+
+    结果按 UPLOAD_USER_CACHE_TTL 在进程内缓存，同一用户连续上传时不重复查询。
+    """
+    if isinstance(user, User):
+        return user
+    now = time.monotonic()
+    with _user_cache_lock:
+        cached = _user_cache.get(user.id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    resolved = User.objects.filter(id=user.id, is_active=True).first()
+    if resolved is None:
+        return None
+    ttl = getattr(settings, 'UPLOAD_USER_CACHE_TTL', 60)
+    with _user_cache_lock:
+        _user_cache[user.id] = (now + ttl, resolved)
+        if len(_user_cache) > 1000:
+            for user_id in [k for k, (expires, _u) in _user_cache.items() if expires <= now]:
+                del _user_cache[user_id]
+    return resolved
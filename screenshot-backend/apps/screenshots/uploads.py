@@ -0,0 +1,765 @@
+"""分片上传的会话清单、流式上传与合并任务
+
+每个上传目录下有一个定长的二进制清单（manifest），记录每个分片是否已收到、
+大小和 SHA-256，已收到的分片数保存在文件头中，在文件锁内更新，
+上传分片和查询进度都不需要列目录。
+
+流式上传模式下，请求体（application/octet-stream）按偏移量直接 pwrite
+到预先 posix_fallocate 好的目标文件中，最后一个分片写完后改名即完成，没有合并步骤。
+
+上传完成的视频记录上传内容的摘要（faststart 之前，由各分片的 SHA-256 算出），MP4 把 moov 移到文件开头（见 faststart.py），
+再登记到内容寻址存储（见 blobs.py）。
+
+合并在后台线程中执行，分片通过 copy_file_range / sendfile 在内核中拷贝到目标文件，
+不经过 Python 内存，内容摘要由清单中各分片的摘要算出。合并接口立即返回任务 ID，
+任务状态写在 temp_chunks/.jobs/<job_id>.json 中，任何 worker 都能读取并返回进度。
+任务提交后为 queued（等待线程池），开始执行后为 merging、faststart 时为 finalizing，执行中定期写心跳；
+失败（包括 worker 退出导致的中断）的任务可以用同一上传 ID 重新发起合并。
+"""
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from apps.users.models import VideoUploadRecord
+
+from .blobs import blob_path, chunk_list_digest, file_sha256, link_to_blob
+from .faststart import FASTSTART_EXTENSIONS, faststart
+
+logger = logging.getLogger(__name__)
+
+# 超过该时间没有更新进度的合并任务视为已中断（如 worker 被重启）
+STALE_JOB_SECONDS = 120
+# 执行中的任务每隔该时间重写一次状态（心跳）
+HEARTBEAT_SECONDS = 10
+# 执行中、会写心跳的任务状态
+RUNNING_STATUSES = ('merging', 'finalizing')
+
+_COPY_FALLBACK_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP}
+
+
+def temp_root():
+    return settings.SCREENSHOTS_ROOT / 'temp_chunks'
+
+
+def jobs_dir():
+    return temp_root() / '.jobs'
+
+
+UPLOAD_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def upload_dir(upload_id, user=None):
+    """上传 ID 对应的分片目录；token 上传的目录名带 user_id 防止冲突。ID 不合法时返回 None"""
+    if not UPLOAD_ID_RE.match(upload_id or ''):
+        return None
+    name = f"{user.id}_{upload_id}" if user is not None else upload_id
+    return temp_root() / name
+
+
+# ---------- 上传会话 ----------
+
+class UploadSession:
+    """分片上传会话清单 temp_dir/manifest
+
+    文件头为 (magic, 分片总数, 已收到分片数)，其后每个分片一条定长记录
+    (是否已收到, 大小, SHA-256)。记录按分片序号定位，用 pread/pwrite 读写，
+    并发写入由 flock 串行化。
+    """
+    MAGIC = b'UPS1'
+    HEADER = struct.Struct('<4sII')
+    RECORD = struct.Struct('<BQ32s')
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def open(cls, temp_dir):
+        """打开已有会话，不存在时返回 None
+
+        create 在文件锁内写文件头，这里加共享锁读取，正在创建、文件头还没写完的会话也视为不存在。
+        """
+        path = temp_dir / 'manifest'
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if len(os.pread(fd, cls.HEADER.size, 0)) < cls.HEADER.size:
+                return None
+        finally:
+            os.close(fd)
+        return cls(path)
+
+    @classmethod
+    def create(cls, temp_dir, total_chunks):
+        """打开或创建会话；分片总数与已有会话不一致时抛出 ValueError"""
+        max_chunks = getattr(settings, 'UPLOAD_MAX_CHUNKS', 10000)
+        if not 0 < total_chunks <= max_chunks:
+            raise ValueError('Invalid totalChunks')
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        session = cls(temp_dir / 'manifest')
+        with session._locked() as fd:
+            header = os.pread(fd, cls.HEADER.size, 0)
+            if not header:
+                os.ftruncate(fd, cls.HEADER.size + total_chunks * cls.RECORD.size)
+                os.pwrite(fd, cls.HEADER.pack(cls.MAGIC, total_chunks, 0), 0)
+            elif cls.HEADER.unpack(header)[1] != total_chunks:
+                raise ValueError('totalChunks does not match upload session')
+        return session
+
+    def _locked(self):
+        return _FileLock(self.path)
+
+    def _header(self, fd):
+        data = os.pread(fd, self.HEADER.size, 0)
+        if len(data) < self.HEADER.size:
+            raise ValueError('Upload session not found')
+        magic, total, received = self.HEADER.unpack(data)
+        if magic != self.MAGIC:
+            raise ValueError('Corrupt upload manifest')
+        return total, received
+
+    def record(self, index, size, digest):
+        """登记一个已写入的分片，返回已收到的分片数"""
+        with self._locked() as fd:
+            total, received = self._header(fd)
+            if not 0 <= index < total:
+                raise ValueError('Invalid chunkIndex')
+            offset = self.HEADER.size + index * self.RECORD.size
+            if not os.pread(fd, 1, offset)[0]:
+                received += 1
+                os.pwrite(fd, self.HEADER.pack(self.MAGIC, total, received), 0)
+            os.pwrite(fd, self.RECORD.pack(1, size, digest), offset)
+        return received
+
+    def total_chunks(self):
+        with self._locked() as fd:
+            return self._header(fd)[0]
+
+    def received_count(self):
+        with self._locked() as fd:
+            return self._header(fd)[1]
+
+    def status(self):
+        """返回 {totalChunks, uploadedChunks, received, sizes, checksums}，后三项按分片序号对应"""
+        with self._locked() as fd:
+            total, received_count = self._header(fd)
+            data = os.pread(fd, total * self.RECORD.size, self.HEADER.size)
+        received, sizes, checksums = [], [], []
+        for index, (flag, size, digest) in enumerate(self.RECORD.iter_unpack(data)):
+            if flag:
+                received.append(index)
+                sizes.append(size)
+                checksums.append(digest.hex())
+        return {
+            'totalChunks': total,
+            'uploadedChunks': received_count,
+            'received': received,
+            'sizes': sizes,
+            'checksums': checksums,
+        }
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self.fd
+
+    def __exit__(self, *exc):
+        os.close(self.fd)
+
+
+def save_chunk(session, temp_dir, index, chunk_file, checksum=''):
+    """写入分片并登记到会话，返回已收到的分片数
+
+    先写临时文件再改名，写到一半中断的分片不会被当成已收到。
+    checksum 为客户端提供的 SHA-256（十六进制），不一致时抛出 ValueError。
+    """
+    total = session.total_chunks()
+    if not 0 <= index < total:
+        raise ValueError('Invalid chunkIndex')
+    chunk_path = temp_dir / f'chunk_{index}'
+    tmp_path = temp_dir / f'.chunk_{index}.{os.getpid()}.{threading.get_ident()}'
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as dest:
+            for chunk in chunk_file.chunks():
+                dest.write(chunk)
+                sha.update(chunk)
+                size += len(chunk)
+        if checksum and checksum.lower() != sha.hexdigest():
+            raise ValueError('Chunk checksum mismatch')
+        os.replace(tmp_path, chunk_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return session.record(index, size, sha.digest())
+
+
+def received_chunks(temp_dir):
+    """已收到的分片数；没有会话清单的旧上传目录按文件计数"""
+    session = UploadSession.open(temp_dir)
+    if session is not None:
+        return session.received_count()
+    return len(list(temp_dir.glob('chunk_*')))
+
+
+# ---------- 流式上传 ----------
+
+STREAM_BUFFER_SIZE = 1024 * 1024
+
+
+def stream_dir(upload_id, user):
+    """流式上传的会话目录，ID 不合法时返回 None"""
+    if not UPLOAD_ID_RE.match(upload_id or ''):
+        return None
+    return temp_root() / f"stream_{user.id}_{upload_id}"
+
+
+def preallocate(path, size):
+    """创建目标文件并预分配空间；文件系统不支持 fallocate 时只设置文件长度"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        try:
+            if size:
+                os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError) as e:
+            if isinstance(e, OSError) and e.errno not in _COPY_FALLBACK_ERRORS:
+                raise
+            os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def _cleanup_streams(max_age):
+    """删除超过 max_age 秒没有写入的流式上传会话（客户端已放弃），释放预分配的空间
+
+    每写入一个分片都会更新清单，以清单的 mtime 判断最后一次写入的时间。
+    """
+    now = time.time()
+    try:
+        entries = [entry for entry in os.scandir(temp_root()) if entry.name.startswith('stream_')]
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            try:
+                mtime = os.stat(os.path.join(entry.path, 'manifest')).st_mtime
+            except FileNotFoundError:
+                mtime = entry.stat().st_mtime
+        except OSError:
+            continue
+        if now - mtime > max_age:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class StreamUpload:
+    """流式上传会话：meta.json（目标信息）+ manifest（分片清单）+ data（预分配的目标文件）"""
+
+    def __init__(self, temp_dir):
+        self.temp_dir = temp_dir
+        self.meta_path = temp_dir / 'meta.json'
+        self.data_path = temp_dir / 'data'
+
+    @classmethod
+    def start(cls, temp_dir, user, brand, model, title, ext, size, chunk_size, sha256=''):
+        """创建会话，或返回参数一致的已有会话（断点续传）；参数不合法时抛出 ValueError
+
+        sha256 为客户端提供的整个文件的摘要，完成时校验，不一致则拒绝。
+        """
+        if size <= 0 or chunk_size <= 0:
+            raise ValueError('Invalid size')
+        # 创建会话就会预分配 size 字节，必须在此之前限制大小
+        if size > getattr(settings, 'UPLOAD_MAX_SIZE', 4 * 1024 * 1024 * 1024):
+            raise ValueError('File too large')
+        if chunk_size > getattr(settings, 'UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 * 1024):
+            raise ValueError('Chunk size too large')
+        _cleanup_streams(getattr(settings, 'STREAM_UPLOAD_EXPIRE_SECONDS', 86400))
+        upload = cls(temp_dir)
+        meta = {
+            'userId': user.id,
+            'brand': brand,
+            'model': model,
+            'title': title,
+            'ext': ext,
+            'size': size,
+            'chunkSize': chunk_size,
+            'sha256': sha256.lower(),
+        }
+        total_chunks = -(-size // chunk_size)
+        session = UploadSession.create(temp_dir, total_chunks)
+        existing = upload.meta()
+        if existing is None:
+            preallocate(upload.data_path, size)
+            tmp = upload.meta_path.with_name(f'meta.json.{os.getpid()}.{threading.get_ident()}.tmp')
+            tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp, upload.meta_path)
+        elif existing != meta:
+            raise ValueError('Upload parameters do not match upload session')
+        return upload, session
+
+    @classmethod
+    def open(cls, temp_dir):
+        """打开已有会话，不存在时返回 None"""
+        upload = cls(temp_dir)
+        session = UploadSession.open(temp_dir)
+        if session is None or upload.meta() is None:
+            return None
+        return upload
+
+    def meta(self):
+        try:
+            return json.loads(self.meta_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def session(self):
+        return UploadSession(self.temp_dir / 'manifest')
+
+    def write(self, offset, stream, length):
+        """从 stream 读取 length 字节写到 offset 处，返回 (已收到分片数, 分片总数)
+
+        offset 必须对齐分片边界，length 必须等于该分片的长度。每次最多读 1MB，
+        内存占用与分片大小无关。
+        """
+        meta = self.meta()
+        chunk_size, size = meta['chunkSize'], meta['size']
+        if offset < 0 or offset % chunk_size or offset >= size:
+            raise ValueError('Invalid offset')
+        if length != min(chunk_size, size - offset):
+            raise ValueError('Invalid chunk length')
+
+        sha = hashlib.sha256()
+        written = 0
+        fd = os.open(self.data_path, os.O_WRONLY)
+        try:
+            while written < length:
+                data = stream.read(min(STREAM_BUFFER_SIZE, length - written))
+                if not data:
+                    break
+                view = memoryview(data)
+                while view:
+                    n = os.pwrite(fd, view, offset + written)
+                    view = view[n:]
+                    written += n
+                sha.update(data)
+        finally:
+            os.close(fd)
+        if written != length:
+            raise ValueError('Incomplete chunk')
+
+        session = self.session()
+        received = session.record(offset // chunk_size, length, sha.digest())
+        return received, session.total_chunks()
+
+    def finish(self, user):
+        """所有分片写完后把目标文件改名到 Pending Video 并登记上传记录
+
+        多个请求同时写完最后的分片时只有一个会执行，其余返回 None。
+        校验失败时抛出 ValueError，文件操作失败时抛出 OSError，会话保留，可以重新完成。
+        """
+        try:
+            os.close(os.open(self.temp_dir / 'finish', os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+        except FileExistsError:
+            return None
+        meta = self.meta()
+        try:
+            # 内容摘要由清单中各分片的摘要算出；分片乱序并行写入，无法边写边算整个文件的摘要，
+            # 只有客户端提供了整个文件的摘要时才读一遍文件校验
+            status = self.session().status()
+            digest = chunk_list_digest(
+                (size, bytes.fromhex(checksum)) for size, checksum in zip(status['sizes'], status['checksums'])
+            )
+            if meta['sha256'] and meta['sha256'] != file_sha256(self.data_path):
+                raise ValueError('File checksum mismatch')
+            filename, file_path = reserve_video_path(
+                meta['brand'], meta['model'], meta['title'], user.username, meta['ext']
+            )
+        except Exception:
+            os.unlink(self.temp_dir / 'finish')
+            raise
+        try:
+            os.replace(self.data_path, file_path)
+        except OSError:
+            file_path.unlink()
+            os.unlink(self.temp_dir / 'finish')
+            raise
+        try:
+            VideoUploadRecord.objects.create(
+                user=user,
+                brand=meta['brand'],
+                model=meta['model'],
+                title=meta['title'],
+                filename=filename,
+                file_path=str(file_path),
+                upload_sha256=digest
+            )
+        except Exception:
+            # 记录没写进去，把文件放回上传目录，客户端可以重新完成上传
+            os.replace(file_path, self.data_path)
+            os.unlink(self.temp_dir / 'finish')
+            raise
+        # 上传记录已提交，才可以删除上传目录
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        submit_finalize(file_path, digest)
+        return filename
+
+
+def reserve_video_path(brand, model, title, username, ext):
+    """生成 Model_Title_username.ext 形式的文件名，已存在时加数字后缀
+
+    用 O_EXCL 创建空文件占位，并发上传同名视频时不会互相覆盖。返回 (文件名, 路径)。
+    """
+    pending_dir = settings.SCREENSHOTS_ROOT / 'Video Tutorial' / 'Pending Video' / brand
+    pending_dir.mkdir(parents=True, exist_ok=True)
+
+    safe_model = model.replace(' ', '_').replace('/', '_')
+    safe_title = title.replace(' ', '_').replace('/', '_')
+    counter = 0
+    while True:
+        suffix = f'_{counter}' if counter else ''
+        filename = f"{safe_model}_{safe_title}_{username}{suffix}{ext}"
+        file_path = pending_dir / filename
+        try:
+            os.close(os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+            return filename, file_path
+        except FileExistsError:
+            counter += 1
+
+
+def copy_fd(src_fd, dst_fd, count, hashes=()):
+    """从 src_fd 当前位置拷贝 count 字节到 dst_fd 当前位置
+
+    优先 copy_file_range（同一文件系统上可能直接共享数据块），其次 sendfile，
+    都不可用时退回固定大小缓冲区的 read/write。传入 hashes（hashlib 对象）时
+    数据必须经过用户态，直接走 read/write 并在拷贝的同时更新摘要。
+    """
+    remaining = count
+    if not hashes and hasattr(os, 'copy_file_range'):
+        try:
+            while remaining > 0:
+                n = os.copy_file_range(src_fd, dst_fd, remaining)
+                if n == 0:
+                    break
+                remaining -= n
+            return count - remaining
+        except OSError as e:
+            if e.errno not in _COPY_FALLBACK_ERRORS:
+                raise
+    if not hashes and hasattr(os, 'sendfile'):
+        try:
+            while remaining > 0:
+                n = os.sendfile(dst_fd, src_fd, None, remaining)
+                if n == 0:
+                    break
+                remaining -= n
+            return count - remaining
+        except OSError as e:
+            if e.errno not in _COPY_FALLBACK_ERRORS:
+                raise
+    while remaining > 0:
+        data = os.read(src_fd, min(remaining, 1024 * 1024))
+        if not data:
+            break
+        for sha in hashes:
+            sha.update(data)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(dst_fd, view):]
+        remaining -= len(data)
+    return count - remaining
+
+
+# ---------- 任务状态 ----------
+
+def _job_path(job_id):
+    return jobs_dir() / f'{job_id}.json'
+
+
+def write_job(job_id, **state):
+    """原子地写入任务状态"""
+    state['updatedAt'] = time.time()
+    path = _job_path(job_id)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_text(json.dumps(state, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+    return state
+
+
+def read_job(job_id):
+    """读取任务状态，任务不存在时返回 None"""
+    if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+        return None
+    try:
+        state = json.loads(_job_path(job_id).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    status = state.get('status')
+    if ((status == 'queued' and not _pid_alive(state.get('pid')))
+            or (status in RUNNING_STATUSES and time.time() - state.get('updatedAt', 0) > STALE_JOB_SECONDS)):
+        state['status'] = 'failed'
+        state['error'] = 'Merge interrupted'
+    return state
+
+
+def _pid_alive(pid):
+    """排队中的任务只存在于提交它的 worker 的线程池里，该进程退出后任务不会再执行"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _heartbeat(job_id, state):
+    """在后台线程中定期写入任务状态，耗时步骤中的任务不会被判定为中断"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                write_job(job_id, **state)
+            except OSError:
+                logger.warning('Heartbeat for job %s failed', job_id, exc_info=True)
+
+    thread = threading.Thread(target=beat, name='merge-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _cleanup_jobs(max_age=86400):
+    now = time.time()
+    try:
+        entries = list(os.scandir(jobs_dir()))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if now - entry.stat().st_mtime > max_age:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+
+
+# ---------- 合并 ----------
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'UPLOAD_MERGE_WORKERS', 2),
+                    thread_name_prefix='chunk-merge',
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def start_merge(user, temp_dir, total_chunks, brand, model, title, ext, sha256=''):
+    """占好目标文件名并提交后台合并任务，返回任务状态；上传目录不存在时返回 None
+
+    同一上传重复请求合并时返回未失败的已有任务，不会重复合并；已失败的任务被新任务替换。
+    sha256 为客户端提供的整个文件的摘要，合并结果不一致时任务失败。
+    """
+    jobs_dir().mkdir(parents=True, exist_ok=True)
+    _cleanup_jobs()
+
+    with ExitStack() as stack:
+        try:
+            fd = stack.enter_context(_FileLock(temp_dir / 'merge.job'))
+        except FileNotFoundError:
+            # 并发的合并请求已完成并删除了上传目录
+            return None
+        existing = read_job(os.pread(fd, 64, 0).decode('ascii', 'replace').strip())
+        if existing is not None and existing['status'] != 'failed':
+            return existing
+        if existing is not None:
+            _discard_placeholder(existing)
+
+        job_id = uuid.uuid4().hex
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, job_id.encode('ascii'), 0)
+
+        final_filename, file_path = reserve_video_path(brand, model, title, user.username, ext)
+        state = write_job(
+            job_id,
+            jobId=job_id,
+            userId=user.id,
+            status='queued',
+            pid=os.getpid(),
+            bytesMerged=0,
+            totalBytes=None,
+            filename=final_filename,
+            filePath=str(file_path),
+            brand=brand,
+            model=model,
+            title=title,
+            error='',
+        )
+        _get_executor().submit(_run_merge, job_id, state, user, temp_dir, total_chunks, file_path, sha256.lower())
+    return state
+
+
+def _discard_placeholder(job):
+    """删除中断的任务留下的目标文件（已登记上传记录的除外）"""
+    file_path = job.get('filePath')
+    if not file_path or VideoUploadRecord.objects.filter(file_path=file_path).exists():
+        return
+    try:
+        os.unlink(file_path)
+    except OSError:
+        pass
+
+
+def _run_merge(job_id, state, user, temp_dir, total_chunks, file_path, expected_sha256=''):
+    # 从这里开始计算是否超时，排队等待线程池的时间不算在内
+    state['status'] = 'merging'
+    try:
+        with _heartbeat(job_id, state):
+            _merge(job_id, state, user, temp_dir, total_chunks, file_path, expected_sha256)
+        state['status'] = 'done'
+        write_job(job_id, **state)
+    except Exception as e:
+        logger.exception('Chunk merge %s failed', job_id)
+        try:
+            file_path.unlink()
+        except OSError:
+            pass
+        state.update(status='failed', error=str(e))
+        write_job(job_id, **state)
+    finally:
+        close_old_connections()
+
+
+def _merge(job_id, state, user, temp_dir, total_chunks, file_path, expected_sha256):
+    chunk_paths = [temp_dir / f'chunk_{i}' for i in range(total_chunks)]
+    state['totalBytes'] = sum(p.stat().st_size for p in chunk_paths if p.exists())
+    write_job(job_id, **state)
+
+    # 保存分片时已记录各分片的大小和 SHA-256，上传内容的摘要由它们算出，分片在内核中拷贝即可；
+    # 只有客户端提供了整个文件的摘要、或旧上传目录没有清单时，数据才需要经过用户态计算摘要
+    recorded = {}
+    session = UploadSession.open(temp_dir)
+    if session is not None:
+        status = session.status()
+        recorded = {
+            index: (size, bytes.fromhex(checksum))
+            for index, size, checksum in zip(status['received'], status['sizes'], status['checksums'])
+        }
+    whole_sha = hashlib.sha256() if expected_sha256 else None
+
+    merged = 0
+    chunks = []
+    last_report = time.monotonic()
+    dst_fd = os.open(file_path, os.O_WRONLY | os.O_TRUNC)
+    try:
+        for index, chunk_path in enumerate(chunk_paths):
+            try:
+                src_fd = os.open(chunk_path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                size = os.fstat(src_fd).st_size
+                hashes = [whole_sha] if whole_sha is not None else []
+                chunk_sha = None
+                if recorded.get(index, (None,))[0] != size:
+                    chunk_sha = hashlib.sha256()
+                    hashes.append(chunk_sha)
+                copied = copy_fd(src_fd, dst_fd, size, hashes)
+            finally:
+                os.close(src_fd)
+            merged += copied
+            chunks.append((copied, chunk_sha.digest() if chunk_sha is not None else recorded[index][1]))
+            if time.monotonic() - last_report >= 1:
+                state['bytesMerged'] = merged
+                write_job(job_id, **state)
+                last_report = time.monotonic()
+    finally:
+        os.close(dst_fd)
+
+    if whole_sha is not None and whole_sha.hexdigest() != expected_sha256:
+        raise ValueError('File checksum mismatch')
+    digest = chunk_list_digest(chunks)
+
+    # faststart 需要重写整个文件，大文件耗时较长，期间由心跳保持任务状态
+    state.update(status='finalizing', bytesMerged=merged)
+    write_job(job_id, **state)
+    finalize_video(file_path, digest)
+
+    VideoUploadRecord.objects.create(
+        user=user,
+        brand=state['brand'],
+        model=state['model'],
+        title=state['title'],
+        filename=state['filename'],
+        file_path=str(file_path),
+        upload_sha256=digest
+    )
+    # 上传记录已提交，才删除分片；之前任何一步失败，分片都还在，可以重新合并
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    state['bytesMerged'] = merged
+
+
+# ---------- 上传后处理 ----------
+
+def finalize_video(file_path, digest):
+    """上传完成后的处理：MP4 moov 前置，再登记到内容寻址存储
+
+    前置处理是确定性的，相同的上传内容处理结果也相同，所以 blob 仍以上传内容的
+    摘要为键；已有该 blob 时直接链接，跳过前置处理。
+    """
+    if (getattr(settings, 'VIDEO_FASTSTART', True)
+            and file_path.suffix.lower() in FASTSTART_EXTENSIONS
+            and not blob_path(digest).exists()):
+        try:
+            faststart(file_path)
+        except (OSError, ValueError):
+            logger.warning('Faststart %s failed', file_path, exc_info=True)
+    link_to_blob(file_path, digest)
+
+
+def submit_finalize(file_path, digest):
+    """在后台线程中执行 finalize_video，不阻塞上传请求"""
+    def run():
+        try:
+            finalize_video(file_path, digest)
+        except Exception:
+            logger.exception('Finalizing %s failed', file_path)
+
+    _get_executor().submit(run)
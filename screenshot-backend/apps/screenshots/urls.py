@@ -6,15 +6,25 @@ urlpatterns = [
     path('brands/', views.BrandListView.as_view(), name='brand-list'),
     path('models/', views.ModelListView.as_view(), name='model-list'),
     path('search/', views.ImageSearchView.as_view(), name='image-search'),
+    path('search-all/', views.GlobalSearchView.as_view(), name='image-search-all'),
+    path('search-batch/', views.BatchSearchView.as_view(), name='image-search-batch'),
+    path('thumbnail/', views.ThumbnailView.as_view(), name='thumbnail'),
     path('components/', views.ComponentListView.as_view(), name='component-list'),
     path('component-data/', views.ComponentContentView.as_view(), name='component-data'),
+    path('component-query/', views.ComponentQueryView.as_view(), name='component-query'),
     path('videos/', views.VideoListView.as_view(), name='video-list'),
     path('upload-video/', views.VideoUploadView.as_view(), name='upload-video'),
     path('upload-chunk/', views.ChunkUploadView.as_view(), name='upload-chunk'),
+    path('stream-upload/', views.StreamUploadView.as_view(), name='stream-upload'),
+    path('upload-status/', views.UploadStatusView.as_view(), name='upload-status'),
     path('merge-chunks/', views.ChunkMergeView.as_view(), name='merge-chunks'),
+    path('merge-status/', views.MergeStatusView.as_view(), name='merge-status'),
     path('my-uploads/', views.MyUploadsView.as_view(), name='my-uploads'),
     # Token-based upload endpoints (for bypassing Cloudflare via upload subdomain)
     path('upload-token/', views.UploadTokenView.as_view(), name='upload-token'),
     path('upload-chunk-token/', views.ChunkUploadTokenView.as_view(), name='upload-chunk-token'),
+    path('stream-upload-token/', views.StreamUploadTokenView.as_view(), name='stream-upload-token'),
+    path('upload-status-token/', views.UploadStatusTokenView.as_view(), name='upload-status-token'),
     path('merge-chunks-token/', views.ChunkMergeTokenView.as_view(), name='merge-chunks-token'),
+    path('merge-status-token/', views.MergeStatusTokenView.as_view(), name='merge-status-token'),
 ]
@@ -0,0 +1,285 @@
+"""视频元数据（时长、分辨率、码率、编码）
+
+只读取文件头部结构：MP4/MOV 读取顶层 box 头和 moov，WebM/MKV 读取开头的 EBML
+（Segment 中 Cluster 之前的 Info 和 Tracks），不读取媒体数据。
+结果按文件 mtime/大小缓存；目录的 catalog 版本只决定是否重新列出文件名，
+每次列表仍会 stat 各文件，只重新解析 mtime/大小变了的文件（同名改写也能发现）。
+"""
+import logging
+import os
+import struct
+import threading
+
+from django.conf import settings
+
+from config.metrics import count
+
+from .catalog import get_catalog
+from .faststart import iter_top_boxes, parse_boxes
+
+logger = logging.getLogger(__name__)
+
+MP4_EXTENSIONS = {'.mp4', '.m4v', '.mov'}
+EBML_EXTENSIONS = {'.webm', '.mkv'}
+
+# WebM 只解析文件开头这么多字节
+EBML_HEADER_BYTES = 1024 * 1024
+
+
+# ---------- MP4 ----------
+
+def _child(boxes, box_type):
+    for child_type, content in boxes:
+        if child_type == box_type:
+            return content
+    return None
+
+
+def _path(boxes, *types):
+    for box_type in types:
+        if boxes is None:
+            return None
+        boxes = _child(boxes, box_type)
+    return boxes
+
+
+def probe_mp4(fd, file_size):
+    moov = next((b for b in iter_top_boxes(fd, file_size) if b[0] == b'moov'), None)
+    if moov is None:
+        return {}
+    _type, offset, header, size = moov
+    tree = parse_boxes(os.pread(fd, size - header, offset + header))
+
+    meta = {}
+    mvhd = _child(tree, b'mvhd')
+    if mvhd:
+        if mvhd[0] == 1:
+            timescale, duration = struct.unpack_from('>IQ', mvhd, 20)
+        else:
+            timescale, duration = struct.unpack_from('>II', mvhd, 12)
+        if timescale:
+            meta['duration'] = round(duration / timescale, 3)
+
+    for trak_type, trak in tree:
+        if trak_type != b'trak':
+            continue
+        hdlr = _path(trak, b'mdia', b'hdlr')
+        handler = hdlr[8:12] if hdlr and len(hdlr) >= 12 else b''
+        stsd = _path(trak, b'mdia', b'minf', b'stbl', b'stsd')
+        codec = stsd[12:16].decode('latin-1').strip() if stsd and len(stsd) >= 16 else ''
+        if handler == b'vide' and 'codec' not in meta:
+            meta['codec'] = codec
+            # tkhd 末尾的显示宽高（16.16 定点数）
+            tkhd = _child(trak, b'tkhd')
+            pos = 76 if tkhd and tkhd[0] == 0 else 88
+            if tkhd and len(tkhd) >= pos + 8:
+                width, height = struct.unpack_from('>II', tkhd, pos)
+                meta['width'] = width >> 16
+                meta['height'] = height >> 16
+        elif handler == b'soun' and 'audioCodec' not in meta:
+            meta['audioCodec'] = codec
+    return meta
+
+
+# ---------- WebM / Matroska ----------
+
+EBML_ID = 0x1A45DFA3
+SEGMENT_ID = 0x18538067
+INFO_ID = 0x1549A966
+TRACKS_ID = 0x1654AE6B
+CLUSTER_ID = 0x1F43B675
+TIMECODE_SCALE_ID = 0x2AD7B1
+DURATION_ID = 0x4489
+TRACK_ENTRY_ID = 0xAE
+TRACK_TYPE_ID = 0x83
+CODEC_ID_ID = 0x86
+VIDEO_ID = 0xE0
+PIXEL_WIDTH_ID = 0xB0
+PIXEL_HEIGHT_ID = 0xBA
+
+
+def _vint(data, pos, keep_marker):
+    """读取 EBML 变长整数，返回 (值, 新位置)；长度全为 1 的 size 表示未知，返回 None"""
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8 or pos + length > len(data):
+        raise ValueError('Invalid EBML')
+    value = first if keep_marker else first & (mask - 1)
+    for b in data[pos + 1:pos + length]:
+        value = (value << 8) | b
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = None
+    return value, pos + length
+
+
+def _elements(data, start, end):
+    """遍历 [start, end) 中的元素，产出 (ID, 内容起点, 内容终点)"""
+    pos = start
+    while pos < end:
+        element_id, pos = _vint(data, pos, True)
+        size, pos = _vint(data, pos, False)
+        content_end = end if size is None else min(pos + size, end)
+        yield element_id, pos, content_end
+        pos = content_end
+
+
+def _uint(data, start, end):
+    return int.from_bytes(data[start:end], 'big')
+
+
+def probe_ebml(fd, file_size):
+    data = os.pread(fd, min(file_size, EBML_HEADER_BYTES), 0)
+    meta = {}
+    timecode_scale = 1000000
+    duration = None
+    for element_id, start, end in _elements(data, 0, len(data)):
+        if element_id != SEGMENT_ID:
+            continue
+        for child_id, c_start, c_end in _elements(data, start, end):
+            if child_id == CLUSTER_ID:
+                break
+            if child_id == INFO_ID:
+                for info_id, i_start, i_end in _elements(data, c_start, c_end):
+                    if info_id == TIMECODE_SCALE_ID:
+                        timecode_scale = _uint(data, i_start, i_end)
+                    elif info_id == DURATION_ID and i_end - i_start in (4, 8):
+                        fmt = '>f' if i_end - i_start == 4 else '>d'
+                        duration = struct.unpack(fmt, data[i_start:i_end])[0]
+            elif child_id == TRACKS_ID:
+                for entry_id, e_start, e_end in _elements(data, c_start, c_end):
+                    if entry_id == TRACK_ENTRY_ID:
+                        _probe_track(data, e_start, e_end, meta)
+        break
+    if duration is not None:
+        meta['duration'] = round(duration * timecode_scale / 1e9, 3)
+    return meta
+
+
+def _probe_track(data, start, end, meta):
+    track_type = 0
+    codec = ''
+    width = height = None
+    for element_id, e_start, e_end in _elements(data, start, end):
+        if element_id == TRACK_TYPE_ID:
+            track_type = _uint(data, e_start, e_end)
+        elif element_id == CODEC_ID_ID:
+            codec = data[e_start:e_end].decode('ascii', 'replace').rstrip('\x00')
+        elif element_id == VIDEO_ID:
+            for video_id, v_start, v_end in _elements(data, e_start, e_end):
+                if video_id == PIXEL_WIDTH_ID:
+                    width = _uint(data, v_start, v_end)
+                elif video_id == PIXEL_HEIGHT_ID:
+                    height = _uint(data, v_start, v_end)
+    if track_type == 1 and 'codec' not in meta:
+        meta['codec'] = codec
+        if width and height:
+            meta['width'] = width
+            meta['height'] = height
+    elif track_type == 2 and 'audioCodec' not in meta:
+        meta['audioCodec'] = codec
+
+
+def probe_video(path):
+    """读取视频元数据，返回 {duration, width, height, bitrate, codec, audioCodec} 中能得到的字段"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in MP4_EXTENSIONS:
+        probe = probe_mp4
+    elif ext in EBML_EXTENSIONS:
+        probe = probe_ebml
+    else:
+        return {}
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        # 列目录之后文件被删除或改名（上传、faststart 时很常见），当作没有元数据
+        return {}
+    try:
+        file_size = os.fstat(fd).st_size
+        try:
+            meta = probe(fd, file_size)
+        except (ValueError, struct.error, IndexError, OSError):
+            logger.warning('Cannot read video metadata: %s', path)
+            return {}
+    finally:
+        os.close(fd)
+    if meta.get('duration'):
+        meta['bitrate'] = int(file_size * 8 / meta['duration'])
+    return meta
+
+
+# ---------- 缓存 ----------
+
+class VideoMetaIndex:
+    """按目录缓存视频元数据：rel_path -> ((mtime_ns, size), meta)"""
+
+    def __init__(self):
+        self._entries = {}
+        self._dirs = {}  # 目录 -> (catalog 版本, [(rel_path, filename)])
+        self._lock = threading.Lock()
+
+    def get(self, rel_path, st):
+        """返回文件的元数据（含 size），mtime/大小不变时复用缓存"""
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(rel_path)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        meta = probe_video(settings.SCREENSHOTS_ROOT / rel_path)
+        meta['size'] = st.st_size
+        with self._lock:
+            self._entries[rel_path] = (key, meta)
+        return meta
+
+    def _names(self, catalog, parts, extensions):
+        """目录下的视频文件名，目录版本号不变时复用上次的列表"""
+        version = catalog.version(*parts)
+        with self._lock:
+            cached = self._dirs.get(parts)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        names = [
+            (rel_path, filename) for rel_path, filename in catalog.iter_files(*parts)
+            if os.path.splitext(filename)[1].lower() in extensions
+        ]
+        with self._lock:
+            self._dirs[parts] = (version, names)
+            # 清理已不在任何目录列表中的文件
+            live = {rel_path for _version, items in self._dirs.values() for rel_path, _f in items}
+            for rel_path in [p for p in self._entries if p not in live]:
+                del self._entries[rel_path]
+        return names
+
+    def list_dir(self, *parts, extensions):
+        """返回目录下视频的 [(rel_path, filename, meta)]
+
+        文件名列表按目录版本号缓存；文件可能被同名改写（合并、faststart），
+        每次都 stat 一遍，按 (mtime, 大小) 判断元数据缓存是否有效。
+        """
+        result = []
+        for rel_path, filename in self._names(get_catalog(), parts, extensions):
+            try:
+                st = os.stat(settings.SCREENSHOTS_ROOT / rel_path)
+            except OSError:
+                continue
+            result.append((rel_path, filename, self.get(rel_path, st)))
+        count('files_scanned', len(result))
+        return result
+
+
+_index = None
+_index_pid = None
+_index_lock = threading.Lock()
+
+
+def get_video_meta_index():
+    global _index, _index_pid
+    if _index is None or _index_pid != os.getpid():
+        with _index_lock:
+            if _index is None or _index_pid != os.getpid():
+                _index = VideoMetaIndex()
+                _index_pid = os.getpid()
+    return _index
@@ -1,12 +1,34 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import BrokenExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
+from urllib.parse import quote
 from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, HttpResponseRedirect
+from django.utils.http import parse_etags
 from django.contrib.sessions.models import Session
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from apps.users.models import VideoUploadRecord, QueryLog, User
-import hashlib
-import time
+from apps.users.models import VideoUploadRecord
+from apps.users.query_log import log_queries, log_query
+from config.metrics import timer
+from .blobs import chunk_list_digest
+from .cache import get_component_cache
+from .catalog import get_catalog
+from .component_index import get_component_index
+from .search_index import decode_cursor, encode_cursor, get_global_index, get_model_index
+from .uploads import (
+    StreamUpload, UploadSession, read_job, received_chunks, save_chunk, start_merge, stream_dir,
+    submit_finalize, upload_dir,
+)
+from .thumbnails import IMAGE_EXTENSIONS, ensure_thumbnail, thumbnail_url
+from .upload_tokens import make_upload_token, resolve_upload_user, verify_upload_token
+from .video_meta import get_video_meta_index
+
+VIDEO_EXTENSIONS = {'.mp4', '.webm', '.mov', '.avi', '.mkv'}
 
 
 class ModeListView(APIView):
@@ -14,14 +36,7 @@ class ModeListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        screenshots_dir = settings.SCREENSHOTS_ROOT
-        modes = []
-
-        if screenshots_dir.exists():
-            for item in sorted(screenshots_dir.iterdir()):
-                if item.is_dir() and not item.name.startswith('.'):
-                    modes.append(item.name)
-
+        modes = get_catalog().list_dirs()
         return Response({'modes': modes})
 
 
@@ -34,14 +49,7 @@ class BrandListView(APIView):
         if not mode:
             return Response({'error': 'Please specify mode'}, status=400)
 
-        mode_dir = settings.SCREENSHOTS_ROOT / mode
-        brands = []
-
-        if mode_dir.exists():
-            for item in sorted(mode_dir.iterdir()):
-                if item.is_dir() and not item.name.startswith('.') and item.name != 'data':
-                    brands.append(item.name)
-
+        brands = get_catalog().list_dirs(mode, exclude={'data'})
         return Response({'brands': brands})
 
 
@@ -56,14 +64,7 @@ class ModelListView(APIView):
         if not mode or not brand:
             return Response({'error': 'Please specify mode and brand'}, status=400)
 
-        brand_dir = settings.SCREENSHOTS_ROOT / mode / brand
-        models = []
-
-        if brand_dir.exists():
-            for item in sorted(brand_dir.iterdir()):
-                if item.is_dir() and not item.name.startswith('.') and item.name != 'data':
-                    models.append(item.name)
-
+        models = get_catalog().list_dirs(mode, brand, exclude={'data'})
         return Response({'models': models})
 
 
@@ -82,38 +83,184 @@ class ImageSearchView(APIView):
         if not keyword:
             return Response({'error': 'Please enter search keyword'}, status=400)
 
-        target_dir = settings.SCREENSHOTS_ROOT / mode / brand / model
-
-        images = []
-        if target_dir.exists():
-            images = self._search_images(target_dir, keyword)
+        limit = request.query_params.get('limit')
+        cursor = request.query_params.get('cursor', '')
+        after = None
+        try:
+            if limit is not None or cursor:
+                limit = min(max(int(limit or settings.SEARCH_PAGE_SIZE), 1), settings.SEARCH_MAX_LIMIT)
+            if cursor:
+                after = decode_cursor(cursor)
+        except ValueError:
+            return Response({'error': 'Invalid limit or cursor'}, status=400)
 
-        # 记录查询日志
-        QueryLog.objects.create(
-            user=request.user,
-            mode='Error Code',
-            brand=brand,
-            keyword=keyword
+        images, total, total_exact, next_cursor = self._search_images(
+            mode, brand, model, keyword, after=after, limit=limit
         )
 
-        return Response({'images': images})
+        # 记录查询日志（翻页请求不重复记录）
+        if not cursor:
+            log_query(request.user, 'Error Code', brand, keyword)
+
+        return Response({
+            'images': images,
+            'total': total,
+            'totalExact': total_exact,
+            'nextCursor': next_cursor,
+        })
+
+    def _search_images(self, mode, brand, model, keyword, after=None, limit=None):
+        """按关键词搜索型号目录下的图片（n-gram 与归一化代码索引）
+
+        结果按 精确 → 前缀 → 包含 → 容错 排序。limit 为 None 时返回全部匹配；
+        否则返回游标之后的一页，同时返回总数、总数是否精确以及下一页游标。
+        """
+        with timer('index'):
+            index = get_model_index(mode, brand, model)
+        if index is None:
+            return [], 0, True, None
+        with timer('search'):
+            if limit is None:
+                matches = index.match(keyword)
+                total, total_exact, next_after = len(matches), True, None
+            else:
+                matches, total, total_exact, next_after = index.search_page(keyword, after=after, limit=limit)
+        next_cursor = encode_cursor(next_after) if next_after else None
+        return image_results(matches), total, total_exact, next_cursor
+
+
+def image_results(matches):
+    return [{
+        'name': name,
+        'filename': filename,
+        'path': f'/screenshots/{rel_path}',
+        'thumb': thumbnail_url(rel_path),
+        'match': match,
+    } for match, (name, filename, rel_path) in matches]
+
+
+class BatchSearchView(APIView):
+    """批量搜索图片：同一型号下多个关键词一次查询，每个关键词返回一页结果"""
+    permission_classes = [IsAuthenticated]
 
-    def _search_images(self, directory, keyword):
-        """递归搜索匹配关键词的图片"""
-        images = []
-        image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+    def post(self, request):
+        mode = request.data.get('mode', 'Error Code')
+        brand = request.data.get('brand', '')
+        model = request.data.get('model', '')
+        keywords = request.data.get('keywords', '')
 
-        for item in directory.rglob('*'):
-            if item.is_file() and item.suffix.lower() in image_extensions:
-                if keyword.lower() in item.stem.lower():
-                    rel_path = item.relative_to(settings.SCREENSHOTS_ROOT)
-                    images.append({
-                        'name': item.stem,
-                        'filename': item.name,
-                        'path': f'/screenshots/{rel_path.as_posix()}',
-                    })
+        if not brand or not model:
+            return Response({'error': 'Please specify brand and model'}, status=400)
+        if isinstance(keywords, str):
+            # 从日志粘贴的文本按逗号、分号、换行拆分
+            keywords = re.split(r'[,;\r\n]+', keywords)
+        if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+            return Response({'error': 'Invalid keywords'}, status=400)
+        keywords = list(dict.fromkeys(k.strip() for k in keywords if k.strip()))
+        if not keywords:
+            return Response({'error': 'Please enter search keyword'}, status=400)
+        if len(keywords) > settings.BATCH_SEARCH_MAX_KEYWORDS:
+            return Response({'error': f'At most {settings.BATCH_SEARCH_MAX_KEYWORDS} keywords'}, status=400)
+        try:
+            limit = min(max(int(request.data.get('limit') or settings.SEARCH_PAGE_SIZE), 1), settings.SEARCH_MAX_LIMIT)
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid limit'}, status=400)
+
+        with timer('index'):
+            index = get_model_index(mode, brand, model)
+        results = []
+        with timer('search'):
+            for keyword in keywords:
+                if index is None:
+                    matches, total, total_exact, next_after = [], 0, True, None
+                else:
+                    matches, total, total_exact, next_after = index.search_page(keyword, limit=limit)
+                results.append({
+                    'keyword': keyword,
+                    'images': image_results(matches),
+                    'total': total,
+                    'totalExact': total_exact,
+                    'nextCursor': encode_cursor(next_after) if next_after else None,
+                })
+
+        log_queries(request.user, 'Error Code', brand, keywords)
+
+        return Response({'results': results})
+
+
+class GlobalSearchView(APIView):
+    """跨型号搜索图片（可限定品牌），结果按品牌/型号分组"""
+    permission_classes = [IsAuthenticated]
 
-        return sorted(images, key=lambda x: x['name'])
+    def get(self, request):
+        mode = request.query_params.get('mode', 'Error Code')
+        brand = request.query_params.get('brand', '')
+        keyword = request.query_params.get('keyword', '')
+
+        if not keyword:
+            return Response({'error': 'Please enter search keyword'}, status=400)
+        try:
+            per_group = min(max(int(request.query_params.get('perGroup') or settings.GLOBAL_SEARCH_GROUP_SIZE), 1),
+                            settings.SEARCH_MAX_LIMIT)
+            max_groups = min(max(int(request.query_params.get('groups') or settings.GLOBAL_SEARCH_MAX_GROUPS), 1),
+                             settings.GLOBAL_SEARCH_GROUP_LIMIT)
+        except ValueError:
+            return Response({'error': 'Invalid perGroup or groups'}, status=400)
+
+        with timer('index'):
+            index = get_global_index(mode, brand or None)
+        groups, matched, total = [], 0, 0
+        if index is not None:
+            with timer('search'):
+                groups, matched, total = index.search_groups(keyword, per_group=per_group, max_groups=max_groups)
+
+        log_query(request.user, 'Error Code', brand, keyword)
+
+        return Response({
+            'groups': [{
+                'brand': group_brand,
+                'model': model,
+                'images': image_results(matches),
+                'total': group_total,
+                'totalExact': total_exact,
+                # 组内后续结果用 search/ 接口按型号翻页
+                'nextCursor': encode_cursor(next_after) if next_after else None,
+            } for group_brand, model, matches, group_total, total_exact, next_after in groups],
+            'totalGroups': matched,
+            'total': total,
+        })
+
+
+class ThumbnailView(APIView):
+    """按需生成缩略图并跳转到缩略图静态地址"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        rel_path = request.query_params.get('path', '')
+        parts = rel_path.split('/')
+        if not rel_path or '..' in parts or '' in parts:
+            return Response({'error': 'Invalid path'}, status=400)
+
+        # 只允许目录索引中已有的图片，避免任意路径读取
+        directory = get_catalog().lookup(*parts[:-1])
+        filename = parts[-1]
+        if (directory is None or filename not in directory.files
+                or os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS):
+            return Response({'error': 'Image not found'}, status=404)
+
+        try:
+            thumb_rel = ensure_thumbnail(rel_path)
+        except FutureTimeoutError:
+            # 生成仍在后台进行，这次先跳转到原图，之后的请求就能拿到缩略图
+            return HttpResponseRedirect(f'/screenshots/{quote(rel_path)}')
+        except BrokenExecutor:
+            return Response({'error': 'Thumbnail service unavailable'}, status=503, headers={'Retry-After': '5'})
+        except (OSError, ValueError) as e:
+            # 原图无法解码或缩略图写入失败
+            return Response({'error': str(e)}, status=500)
+        if thumb_rel is None:
+            return Response({'error': 'Image not found'}, status=404)
+        return HttpResponseRedirect(settings.THUMBNAIL_URL + quote(thumb_rel))
 
 
 class ComponentListView(APIView):
@@ -125,17 +272,14 @@ class ComponentListView(APIView):
         if not brand:
             return Response({'error': 'Please specify brand'}, status=400)
 
-        data_dir = settings.SCREENSHOTS_ROOT / 'Component IO Check' / brand
         files = []
-
-        if data_dir.exists():
-            for item in sorted(data_dir.glob('*.json')):
-                if item.is_file():
-                    name = item.stem.replace('_', ' ')
-                    files.append({
-                        'name': name,
-                        'filename': item.name,
-                    })
+        for _rel_path, filename in get_catalog().iter_files('Component IO Check', brand):
+            stem, suffix = os.path.splitext(filename)
+            if suffix == '.json':
+                files.append({
+                    'name': stem.replace('_', ' '),
+                    'filename': filename,
+                })
 
         return Response({'files': files})
 
@@ -156,24 +300,105 @@ class ComponentContentView(APIView):
 
         json_path = settings.SCREENSHOTS_ROOT / 'Component IO Check' / brand / filename
 
-        if not json_path.exists():
+        try:
+            st = json_path.stat()
+        except OSError:
             return Response({'error': 'Data file not found'}, status=404)
 
         # 记录查询日志
-        QueryLog.objects.create(
-            user=request.user,
-            mode='Component IO Check',
-            brand=brand,
-            keyword=filename
-        )
+        log_query(request.user, 'Component IO Check', brand, filename)
+
+        # 强 ETag 由文件 mtime 和大小决定，客户端缓存有效时无需读取文件
+        version = (st.st_mtime_ns, st.st_size)
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        cache = get_component_cache()
+        body = cache.get(str(json_path), version)
+        if body is None:
+            with timer('load'):
+                try:
+                    data = json.loads(json_path.read_text(encoding='utf-8'))
+                except Exception as e:
+                    return Response({'error': str(e)}, status=500)
+                body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            cache.put(str(json_path), version, body, len(body))
+
+        response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class ComponentQueryView(APIView):
+    """在服务端查询 Component IO Check 记录（支持单个文件或品牌下全部文件）"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        brand = request.query_params.get('brand', '')
+        filename = request.query_params.get('filename', '')
+        q = request.query_params.get('q', '').strip()
+        module = request.query_params.get('module', '').strip()
+        level = request.query_params.get('level', '').strip()
+        cyclic = request.query_params.get('cyclic', '').strip().lower()
+
+        if not brand:
+            return Response({'error': 'Please specify brand'}, status=400)
+        if '..' in brand or '..' in filename or '/' in filename or '\\' in filename:
+            return Response({'error': 'Invalid filename'}, status=400)
 
         try:
-            import json
-            json_content = json_path.read_text(encoding='utf-8')
-            data = json.loads(json_content)
-            return Response(data)
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', settings.SEARCH_PAGE_SIZE)), 1),
+                        settings.SEARCH_MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'Invalid offset or limit'}, status=400)
+        cyclic = {'true': True, '1': True, 'false': False, '0': False}.get(cyclic)
+
+        if filename:
+            filenames = [filename]
+        else:
+            filenames = [name for _rel_path, name in get_catalog().iter_files('Component IO Check', brand)
+                         if name.endswith('.json')]
+
+        # 逐个文件取匹配编号，只为落在 [offset, offset + limit) 内的记录构造响应
+        records = []
+        total = 0
+        title = ''
+        for name in filenames:
+            json_path = settings.SCREENSHOTS_ROOT / 'Component IO Check' / brand / name
+            try:
+                index = get_component_index(json_path)
+            except Exception as e:
+                if filename:
+                    return Response({'error': str(e)}, status=500)
+                continue
+            if index is None:
+                if filename:
+                    return Response({'error': 'Data file not found'}, status=404)
+                continue
+            title = index.title
+            ids = index.query(q=q, module=module, level=level, cyclic=cyclic)
+            start = max(offset - total, 0)
+            end = max(offset + limit - total, 0)
+            for i in ids[start:end]:
+                record = index.records[i]
+                records.append(record if filename else dict(record, file=name))
+            total += len(ids)
+
+        if offset == 0:
+            log_query(request.user, 'Component IO Check', brand, q or filename)
+
+        return Response({
+            'title': title if filename else '',
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'data': records,
+        })
 
 
 class VideoListView(APIView):
@@ -187,30 +412,23 @@ class VideoListView(APIView):
         if not brand:
             return Response({'error': 'Please specify brand'}, status=400)
 
-        video_dir = settings.SCREENSHOTS_ROOT / 'Video Tutorial' / brand
         videos = []
-        video_extensions = {'.mp4', '.webm', '.mov', '.avi', '.mkv'}
-
-        if video_dir.exists():
-            for item in sorted(video_dir.glob('*')):
-                if item.is_file() and item.suffix.lower() in video_extensions:
-                    # 如果有关键词，过滤文件名
-                    if keyword and keyword not in item.stem.lower():
-                        continue
-                    rel_path = item.relative_to(settings.SCREENSHOTS_ROOT)
-                    videos.append({
-                        'name': item.stem,
-                        'filename': item.name,
-                        'path': f'/screenshots/{rel_path.as_posix()}',
-                    })
+        # 元数据（时长、分辨率等）按文件 mtime/大小缓存，目录未变化时不重新读取
+        items = get_video_meta_index().list_dir('Video Tutorial', brand, extensions=VIDEO_EXTENSIONS)
+        for rel_path, filename, meta in items:
+            stem = os.path.splitext(filename)[0]
+            # 如果有关键词，过滤文件名
+            if keyword and keyword not in stem.lower():
+                continue
+            videos.append({
+                'name': stem,
+                'filename': filename,
+                'path': f'/screenshots/{rel_path}',
+                **meta,
+            })
 
         # 记录查询日志
-        QueryLog.objects.create(
-            user=request.user,
-            mode='Video Tutorial',
-            brand=brand,
-            keyword=keyword
-        )
+        log_query(request.user, 'Video Tutorial', brand, keyword)
 
         return Response({'videos': videos})
 
@@ -237,9 +455,8 @@ class VideoUploadView(APIView):
             return Response({'error': 'Please select a video file'}, status=400)
 
         # 检查文件类型
-        video_extensions = {'.mp4', '.webm', '.mov', '.avi', '.mkv'}
         ext = Path(video_file.name).suffix.lower()
-        if ext not in video_extensions:
+        if ext not in VIDEO_EXTENSIONS:
             return Response({'error': 'Invalid video format'}, status=400)
 
         # 创建目录
@@ -260,11 +477,18 @@ class VideoUploadView(APIView):
             file_path = pending_dir / filename
             counter += 1
 
-        # 保存文件
+        # 保存文件，写入时计算 SHA-256
         try:
+            sha = hashlib.sha256()
+            size = 0
             with open(file_path, 'wb+') as dest:
                 for chunk in video_file.chunks():
                     dest.write(chunk)
+                    sha.update(chunk)
+                    size += len(chunk)
+            # 整个文件作为一个分片计算内容摘要，与分片上传一致
+            digest = chunk_list_digest([(size, sha.digest())])
+            submit_finalize(file_path, digest)
 
             # 记录上传记录
             VideoUploadRecord.objects.create(
@@ -273,7 +497,8 @@ class VideoUploadView(APIView):
                 model=model,
                 title=title,
                 filename=filename,
-                file_path=str(file_path)
+                file_path=str(file_path),
+                upload_sha256=digest
             )
 
             return Response({
@@ -287,6 +512,92 @@ class VideoUploadView(APIView):
             return Response({'error': str(e)}, status=500)
 
 
+def _start_stream_upload(request, user, allowed_brands):
+    """创建流式上传会话，返回会话状态"""
+    upload_id = request.data.get('uploadId', '')
+    brand = request.data.get('brand', '')
+    model = request.data.get('model', '').strip()
+    title = request.data.get('title', '').strip()
+    filename = request.data.get('filename', '')
+
+    if not upload_id or not brand or not model or not title or not filename:
+        return Response({'error': 'Missing parameters'}, status=400)
+    if brand not in allowed_brands:
+        return Response({'error': 'Invalid brand'}, status=400)
+    ext = Path(filename).suffix.lower()
+    if ext not in VIDEO_EXTENSIONS:
+        return Response({'error': 'Invalid video format'}, status=400)
+    try:
+        size = int(request.data.get('size'))
+        chunk_size = int(request.data.get('chunkSize'))
+    except (TypeError, ValueError):
+        return Response({'error': 'Invalid size'}, status=400)
+
+    temp_dir = stream_dir(upload_id, user)
+    if temp_dir is None:
+        return Response({'error': 'Invalid uploadId'}, status=400)
+    try:
+        _upload, session = StreamUpload.start(
+            temp_dir, user, brand, model, title, ext, size, chunk_size, request.data.get('sha256', '')
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    except OSError as e:
+        return Response({'error': str(e)}, status=500)
+    return Response(session.status())
+
+
+def _write_stream_chunk(request, user):
+    """把请求体写入流式上传会话，最后一个分片写完后完成上传"""
+    temp_dir = stream_dir(request.query_params.get('uploadId', ''), user)
+    upload = StreamUpload.open(temp_dir) if temp_dir is not None else None
+    if upload is None:
+        return Response({'error': 'Upload not found'}, status=404)
+    if request.content_type != 'application/octet-stream':
+        return Response({'error': 'Content-Type must be application/octet-stream'}, status=415)
+    try:
+        offset = int(request.headers.get('X-Upload-Offset') or request.query_params.get('offset'))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except (TypeError, ValueError):
+        return Response({'error': 'Invalid offset'}, status=400)
+
+    try:
+        # 直接读取原始请求体，不经过 DRF 的解析器
+        received, total_chunks = upload.write(offset, request._request, length)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    except OSError as e:
+        return Response({'error': str(e)}, status=500)
+
+    result = {'uploadedChunks': received, 'totalChunks': total_chunks}
+    if received == total_chunks:
+        user = resolve_upload_user(user)
+        if user is None:
+            return Response({'error': 'Invalid or expired token'}, status=401)
+        try:
+            filename = upload.finish(user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        except OSError as e:
+            return Response({'error': str(e)}, status=500)
+        if filename:
+            result.update(message='Upload successful', filename=filename)
+    return Response(result)
+
+
+class StreamUploadView(APIView):
+    """流式上传视频：POST 创建会话，PUT 按偏移量写入原始请求体"""
+    permission_classes = [IsAuthenticated]
+
+    ALLOWED_BRANDS = ['FUJI XEROX', 'FUJI FILM', 'Canon']
+
+    def post(self, request):
+        return _start_stream_upload(request, request.user, self.ALLOWED_BRANDS)
+
+    def put(self, request):
+        return _write_stream_chunk(request, request.user)
+
+
 class ChunkUploadView(APIView):
     """分片上传视频"""
     permission_classes = [IsAuthenticated]
@@ -309,29 +620,40 @@ class ChunkUploadView(APIView):
         except ValueError:
             return Response({'error': 'Invalid chunk parameters'}, status=400)
 
-        # 创建临时目录存放分片
-        temp_dir = settings.SCREENSHOTS_ROOT / 'temp_chunks' / upload_id
-        temp_dir.mkdir(parents=True, exist_ok=True)
+        temp_dir = upload_dir(upload_id)
+        if temp_dir is None:
+            return Response({'error': 'Invalid uploadId'}, status=400)
 
-        # 保存分片
-        chunk_path = temp_dir / f'chunk_{chunk_index}'
+        # 保存分片并登记到会话清单
         try:
-            with open(chunk_path, 'wb+') as dest:
-                for chunk in chunk_file.chunks():
-                    dest.write(chunk)
-
-            # 检查已上传的分片数
-            uploaded_chunks = len(list(temp_dir.glob('chunk_*')))
-
-            return Response({
-                'message': 'Chunk uploaded',
-                'chunkIndex': chunk_index,
-                'uploadedChunks': uploaded_chunks,
-                'totalChunks': total_chunks
-            })
+            session = UploadSession.create(temp_dir, total_chunks)
+            uploaded_chunks = save_chunk(
+                session, temp_dir, chunk_index, chunk_file, request.data.get('checksum', '')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
+        return Response({
+            'message': 'Chunk uploaded',
+            'chunkIndex': chunk_index,
+            'uploadedChunks': uploaded_chunks,
+            'totalChunks': total_chunks
+        })
+
+
+class UploadStatusView(APIView):
+    """查询分片上传进度（断点续传时跳过已上传的分片）"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        temp_dir = upload_dir(request.query_params.get('uploadId', ''))
+        session = UploadSession.open(temp_dir) if temp_dir is not None else None
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=404)
+        return Response(session.status())
+
 
 class ChunkMergeView(APIView):
     """合并分片"""
@@ -358,13 +680,13 @@ class ChunkMergeView(APIView):
         except ValueError:
             return Response({'error': 'Invalid totalChunks'}, status=400)
 
-        temp_dir = settings.SCREENSHOTS_ROOT / 'temp_chunks' / upload_id
+        temp_dir = upload_dir(upload_id)
 
-        if not temp_dir.exists():
+        if temp_dir is None or not temp_dir.exists():
             return Response({'error': 'Upload not found'}, status=404)
 
         # 检查所有分片是否都已上传
-        uploaded_chunks = len(list(temp_dir.glob('chunk_*')))
+        uploaded_chunks = received_chunks(temp_dir)
         if uploaded_chunks < total_chunks:
             return Response({
                 'error': f'Missing chunks: {uploaded_chunks}/{total_chunks}',
@@ -372,57 +694,41 @@ class ChunkMergeView(APIView):
                 'totalChunks': total_chunks
             }, status=400)
 
-        # 创建目标目录
-        pending_dir = settings.SCREENSHOTS_ROOT / 'Video Tutorial' / 'Pending Video' / brand
-        pending_dir.mkdir(parents=True, exist_ok=True)
-
-        # 生成文件名
+        # 后台合并，立即返回任务 ID，客户端通过 merge-status/ 查询进度
         ext = Path(filename).suffix.lower()
-        safe_model = model.replace(' ', '_').replace('/', '_')
-        safe_title = title.replace(' ', '_').replace('/', '_')
-        username = request.user.username
-        final_filename = f"{safe_model}_{safe_title}_{username}{ext}"
-        file_path = pending_dir / final_filename
-
-        # 如果文件已存在，添加数字后缀
-        counter = 1
-        while file_path.exists():
-            final_filename = f"{safe_model}_{safe_title}_{username}_{counter}{ext}"
-            file_path = pending_dir / final_filename
-            counter += 1
-
-        # 合并分片
-        try:
-            with open(file_path, 'wb') as dest:
-                for i in range(total_chunks):
-                    chunk_path = temp_dir / f'chunk_{i}'
-                    if chunk_path.exists():
-                        with open(chunk_path, 'rb') as chunk:
-                            dest.write(chunk.read())
+        job = start_merge(
+            request.user, temp_dir, total_chunks, brand, model, title, ext, request.data.get('sha256', '')
+        )
+        if job is None:
+            return Response({'error': 'Upload not found'}, status=404)
+        return Response(merge_job_response(job), status=202)
 
-            # 删除临时分片
-            import shutil
-            shutil.rmtree(temp_dir)
 
-            # 记录上传记录
-            VideoUploadRecord.objects.create(
-                user=request.user,
-                brand=brand,
-                model=model,
-                title=title,
-                filename=final_filename,
-                file_path=str(file_path)
-            )
+class MergeStatusView(APIView):
+    """查询合并任务进度"""
+    permission_classes = [IsAuthenticated]
 
-            return Response({
-                'message': 'Upload successful',
-                'filename': final_filename,
-                'brand': brand,
-                'model': model,
-                'title': title
-            })
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+    def get(self, request):
+        job = read_job(request.query_params.get('jobId', ''))
+        if job is None or job.get('userId') != request.user.id:
+            return Response({'error': 'Job not found'}, status=404)
+        return Response(merge_job_response(job))
+
+
+def merge_job_response(job):
+    """合并任务状态的响应内容"""
+    messages = {'queued': 'Queued', 'merging': 'Merging', 'finalizing': 'Processing video', 'done': 'Upload successful', 'failed': job.get('error') or 'Merge failed'}
+    return {
+        'message': messages.get(job['status'], ''),
+        'jobId': job['jobId'],
+        'status': job['status'],
+        'bytesMerged': job['bytesMerged'],
+        'totalBytes': job['totalBytes'],
+        'filename': job['filename'],
+        'brand': job['brand'],
+        'model': job['model'],
+        'title': job['title'],
+    }
 
 
 class MyUploadsView(APIView):
@@ -447,43 +753,9 @@ class UploadTokenView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # 生成一个简单的 token: user_id + timestamp + hash
-        user_id = request.user.id
-        timestamp = int(time.time())
-        secret = settings.SECRET_KEY
-        token_str = f"{user_id}:{timestamp}:{secret}"
-        token_hash = hashlib.sha256(token_str.encode()).hexdigest()[:32]
-        token = f"{user_id}:{timestamp}:{token_hash}"
-        
-        return Response({'token': token, 'expires': timestamp + 3600})  # 1小时有效
-
-
-def verify_upload_token(token):
-    """验证上传 token，返回 user 或 None"""
-    try:
-        parts = token.split(':')
-        if len(parts) != 3:
-            return None
-        
-        user_id, timestamp, token_hash = parts
-        user_id = int(user_id)
-        timestamp = int(timestamp)
-        
-        # 检查是否过期（1小时）
-        if time.time() - timestamp > 3600:
-            return None
-        
-        # 验证 hash
-        secret = settings.SECRET_KEY
-        expected_str = f"{user_id}:{timestamp}:{secret}"
-        expected_hash = hashlib.sha256(expected_str.encode()).hexdigest()[:32]
-        
-        if token_hash != expected_hash:
-            return None
-        
-        return User.objects.get(id=user_id)
-    except Exception:
-        return None
+        # 签名 token 携带用户 ID、用户名和用途，分片接口验证时不需要查数据库
+        token, expires = make_upload_token(request.user)
+        return Response({'token': token, 'expires': expires})
 
 
 class ChunkUploadTokenView(APIView):
@@ -511,28 +783,66 @@ class ChunkUploadTokenView(APIView):
         except ValueError:
             return Response({'error': 'Invalid chunk parameters'}, status=400)
 
-        # 创建临时目录存放分片（包含 user_id 防止冲突）
-        temp_dir = settings.SCREENSHOTS_ROOT / 'temp_chunks' / f"{user.id}_{upload_id}"
-        temp_dir.mkdir(parents=True, exist_ok=True)
+        # 临时目录包含 user_id 防止冲突
+        temp_dir = upload_dir(upload_id, user)
+        if temp_dir is None:
+            return Response({'error': 'Invalid uploadId'}, status=400)
 
-        # 保存分片
-        chunk_path = temp_dir / f'chunk_{chunk_index}'
         try:
-            with open(chunk_path, 'wb+') as dest:
-                for chunk in chunk_file.chunks():
-                    dest.write(chunk)
-
-            uploaded_chunks = len(list(temp_dir.glob('chunk_*')))
-
-            return Response({
-                'message': 'Chunk uploaded',
-                'chunkIndex': chunk_index,
-                'uploadedChunks': uploaded_chunks,
-                'totalChunks': total_chunks
-            })
+            session = UploadSession.create(temp_dir, total_chunks)
+            uploaded_chunks = save_chunk(
+                session, temp_dir, chunk_index, chunk_file, request.data.get('checksum', '')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
+        return Response({
+            'message': 'Chunk uploaded',
+            'chunkIndex': chunk_index,
+            'uploadedChunks': uploaded_chunks,
+            'totalChunks': total_chunks
+        })
+
+
+class UploadStatusTokenView(APIView):
+    """查询分片上传进度（使用 token 验证，支持跨域）"""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        token = request.query_params.get('token', '') or request.headers.get('X-Upload-Token', '')
+        user = verify_upload_token(token)
+        if not user:
+            return Response({'error': 'Invalid or expired token'}, status=401)
+
+        temp_dir = upload_dir(request.query_params.get('uploadId', ''), user)
+        session = UploadSession.open(temp_dir) if temp_dir is not None else None
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=404)
+        return Response(session.status())
+
+
+class StreamUploadTokenView(APIView):
+    """流式上传视频（使用 token 验证，支持跨域）"""
+    permission_classes = [AllowAny]
+
+    ALLOWED_BRANDS = ['FUJI XEROX', 'FUJI FILM', 'Canon']
+
+    def post(self, request):
+        token = request.data.get('token', '') or request.headers.get('X-Upload-Token', '')
+        user = verify_upload_token(token)
+        if not user:
+            return Response({'error': 'Invalid or expired token'}, status=401)
+        return _start_stream_upload(request, user, self.ALLOWED_BRANDS)
+
+    def put(self, request):
+        token = request.query_params.get('token', '') or request.headers.get('X-Upload-Token', '')
+        user = verify_upload_token(token)
+        if not user:
+            return Response({'error': 'Invalid or expired token'}, status=401)
+        return _write_stream_chunk(request, user)
+
 
 class ChunkMergeTokenView(APIView):
     """合并分片（使用 token 验证，支持跨域）"""
@@ -564,12 +874,12 @@ class ChunkMergeTokenView(APIView):
         except ValueError:
             return Response({'error': 'Invalid totalChunks'}, status=400)
 
-        temp_dir = settings.SCREENSHOTS_ROOT / 'temp_chunks' / f"{user.id}_{upload_id}"
+        temp_dir = upload_dir(upload_id, user)
 
-        if not temp_dir.exists():
+        if temp_dir is None or not temp_dir.exists():
             return Response({'error': 'Upload not found'}, status=404)
 
-        uploaded_chunks = len(list(temp_dir.glob('chunk_*')))
+        uploaded_chunks = received_chunks(temp_dir)
         if uploaded_chunks < total_chunks:
             return Response({
                 'error': f'Missing chunks: {uploaded_chunks}/{total_chunks}',
@@ -577,47 +887,29 @@ class ChunkMergeTokenView(APIView):
                 'totalChunks': total_chunks
             }, status=400)
 
-        pending_dir = settings.SCREENSHOTS_ROOT / 'Video Tutorial' / 'Pending Video' / brand
-        pending_dir.mkdir(parents=True, exist_ok=True)
+        # 只有合并需要真实的用户对象（短时间缓存）
+        user = resolve_upload_user(user)
+        if user is None:
+            return Response({'error': 'Invalid or expired token'}, status=401)
 
         ext = Path(filename).suffix.lower()
-        safe_model = model.replace(' ', '_').replace('/', '_')
-        safe_title = title.replace(' ', '_').replace('/', '_')
-        final_filename = f"{safe_model}_{safe_title}_{user.username}{ext}"
-        file_path = pending_dir / final_filename
-
-        counter = 1
-        while file_path.exists():
-            final_filename = f"{safe_model}_{safe_title}_{user.username}_{counter}{ext}"
-            file_path = pending_dir / final_filename
-            counter += 1
+        job = start_merge(user, temp_dir, total_chunks, brand, model, title, ext, request.data.get('sha256', ''))
+        if job is None:
+            return Response({'error': 'Upload not found'}, status=404)
+        return Response(merge_job_response(job), status=202)
 
-        try:
-            with open(file_path, 'wb') as dest:
-                for i in range(total_chunks):
-                    chunk_path = temp_dir / f'chunk_{i}'
-                    if chunk_path.exists():
-                        with open(chunk_path, 'rb') as chunk:
-                            dest.write(chunk.read())
 
-            import shutil
-            shutil.rmtree(temp_dir)
+class MergeStatusTokenView(APIView):
+    """查询合并任务进度（使用 token 验证，支持跨域）"""
+    permission_classes = [AllowAny]
 
-            VideoUploadRecord.objects.create(
-                user=user,
-                brand=brand,
-                model=model,
-                title=title,
-                filename=final_filename,
-                file_path=str(file_path)
-            )
+    def get(self, request):
+        token = request.query_params.get('token', '') or request.headers.get('X-Upload-Token', '')
+        user = verify_upload_token(token)
+        if not user:
+            return Response({'error': 'Invalid or expired token'}, status=401)
 
-            return Response({
-                'message': 'Upload successful',
-                'filename': final_filename,
-                'brand': brand,
-                'model': model,
-                'title': title
-            })
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+        job = read_job(request.query_params.get('jobId', ''))
+        if job is None or job.get('userId') != user.id:
+            return Response({'error': 'Job not found'}, status=404)
+        return Response(merge_job_response(job))
@@ -1,13 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django import forms
-from django.db.models import Count
-from openpyxl import load_workbook
-from .models import User, VideoUploadRecord, QueryLog
+from django.conf import settings
+from .models import User, VideoUploadRecord, QueryLog, DailyQueryStat, DailyUploadStat
+from config.metrics import aggregate_metrics, estimate_quantile
+
+from .bulk_import import import_users
+from .query_archive import ARCHIVE_FIELDS, archive_months, iter_archived, month_range
 
 
 class ExcelImportForm(forms.Form):
     excel_file = forms.FileField(label='Excel File', help_text='Upload Excel file with user data (.xlsx)')
+    dry_run = forms.BooleanField(label='Dry run', required=False, help_text='Only validate the file, do not create users')
 
 
 @admin.register(User)
@@ -26,23 +30,6 @@ class UserAdmin(BaseUserAdmin):
 
     change_list_template = 'admin/users/user/change_list.html'
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(
-            _upload_count=Count('uploads', distinct=True),
-            _query_count=Count('query_logs', distinct=True)
-        )
-
-    def upload_count(self, obj):
-        return obj._upload_count
-    upload_count.short_description = 'Uploads'
-    upload_count.admin_order_field = '_upload_count'
-
-    def query_count(self, obj):
-        return obj._query_count
-    query_count.short_description = 'Queries'
-    query_count.admin_order_field = '_query_count'
-
     def get_urls(self):
         from django.urls import path
         urls = super().get_urls()
@@ -53,60 +40,29 @@ class UserAdmin(BaseUserAdmin):
         return custom_urls + urls
 
     def import_excel(self, request):
-        from django.shortcuts import render, redirect
+        from django.shortcuts import render
         from django.contrib import messages
 
+        result = None
         if request.method == 'POST':
             form = ExcelImportForm(request.POST, request.FILES)
             if form.is_valid():
-                excel_file = request.FILES['excel_file']
                 try:
-                    wb = load_workbook(excel_file)
-                    ws = wb.active
-
-                    created_count = 0
-                    error_rows = []
-
-                    for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                        if not row[0]:
-                            continue
-
-                        username = str(row[0]).strip() if row[0] else ''
-                        password = str(row[1]).strip() if len(row) > 1 and row[1] else 'password123'
-                        phone = str(row[2]).strip() if len(row) > 2 and row[2] else ''
-                        department = str(row[3]).strip() if len(row) > 3 and row[3] else ''
-
-                        if not username:
-                            continue
-
-                        if User.objects.filter(username=username).exists():
-                            error_rows.append(f'Row {row_num}: Username {username} already exists')
-                            continue
-
-                        try:
-                            User.objects.create_user(
-                                username=username,
-                                password=password,
-                                phone=phone,
-                                department=department,
-                            )
-                            created_count += 1
-                        except Exception as e:
-                            error_rows.append(f'Row {row_num}: {str(e)}')
-
-                    if created_count > 0:
-                        messages.success(request, f'Successfully imported {created_count} users')
-                    if error_rows:
-                        messages.warning(request, 'Some imports failed: ' + '; '.join(error_rows[:5]))
-
-                    return redirect('..')
+                    result = import_users(request.FILES['excel_file'], dry_run=form.cleaned_data['dry_run'])
                 except Exception as e:
                     messages.error(request, f'Import failed: {str(e)}')
+                else:
+                    action = 'Dry run: would import' if result.dry_run else 'Successfully imported'
+                    if result.created_count > 0:
+                        messages.success(request, f'{action} {result.created_count} users')
+                    if result.errors:
+                        messages.warning(request, f'{len(result.errors)} rows skipped, see the report below')
         else:
             form = ExcelImportForm()
 
         context = {
             'form': form,
+            'result': result,
             'title': 'Batch Import Users',
             'opts': self.model._meta,
         }
@@ -114,27 +70,45 @@ class UserAdmin(BaseUserAdmin):
 
     def dashboard_view(self, request):
         from django.shortcuts import render
-        from django.db.models.functions import TruncDate
-        from datetime import datetime, timedelta
-
-        query_by_mode = QueryLog.objects.values('mode').annotate(count=Count('id')).order_by('-count')
-        upload_by_brand = VideoUploadRecord.objects.values('brand').annotate(count=Count('id')).order_by('-count')
-
-        seven_days_ago = datetime.now() - timedelta(days=7)
-        daily_queries = QueryLog.objects.filter(created_at__gte=seven_days_ago).annotate(
-            date=TruncDate('created_at')
-        ).values('date').annotate(count=Count('id')).order_by('date')
-
-        top_uploaders = User.objects.annotate(
-            upload_count=Count('uploads')
-        ).filter(upload_count__gt=0).order_by('-upload_count')[:10]
-
-        top_queriers = User.objects.annotate(
-            query_count=Count('query_logs')
-        ).filter(query_count__gt=0).order_by('-query_count')[:10]
-
-        total_uploads = VideoUploadRecord.objects.count()
-        total_queries = QueryLog.objects.count()
+        from django.db.models import F, Sum
+        from django.utils import timezone
+        from datetime import timedelta
+
+        # 只读按天汇总表（见 rollups），不扫描 QueryLog / VideoUploadRecord
+        query_by_mode = DailyQueryStat.objects.values('mode').annotate(count=Sum('count')).order_by('-count')
+        upload_by_brand = DailyUploadStat.objects.values('brand').annotate(count=Sum('count')).order_by('-count')
+
+        seven_days_ago = timezone.localdate() - timedelta(days=7)
+        daily_queries = DailyQueryStat.objects.filter(day__gte=seven_days_ago).values(
+            date=F('day')
+        ).annotate(count=Sum('count')).order_by('date')
+
+        # 排行读取用户表上的计数列
+        top_uploaders = User.objects.filter(upload_count__gt=0).order_by('-upload_count')[:10]
+        top_queriers = User.objects.filter(query_count__gt=0).order_by('-query_count')[:10]
+
+        total_uploads = DailyUploadStat.objects.aggregate(total=Sum('count'))['total'] or 0
+        total_queries = DailyQueryStat.objects.aggregate(total=Sum('count'))['total'] or 0
+
+        # 接口耗时（合并所有 worker 的统计，见 config/metrics.py）
+        endpoints, component_stats, metrics_workers = aggregate_metrics()
+        endpoint_metrics = []
+        for name, data in sorted(endpoints.items(), key=lambda item: -item[1]['sum']):
+            n = data['count'] or 1
+            endpoint_metrics.append({
+                'endpoint': name,
+                'requests': data['count'],
+                'errors': data['status'].get('5xx', 0),
+                'mean_ms': round(data['sum'] / n * 1000, 1),
+                'p50_ms': round(estimate_quantile(data, 0.5) * 1000, 1),
+                'p95_ms': round(estimate_quantile(data, 0.95) * 1000, 1),
+                'db_queries': round(data['counters'].get('db_queries', 0) / n, 1),
+                'kb': round(data['counters'].get('response_bytes', 0) / n / 1024, 1),
+                'phases': ', '.join(
+                    f'{phase} {seconds / n * 1000:.1f}'
+                    for phase, seconds in sorted(data['phases'].items(), key=lambda item: -item[1])
+                ),
+            })
 
         context = {
             'title': 'Statistics Dashboard',
@@ -145,6 +119,12 @@ class UserAdmin(BaseUserAdmin):
             'top_queriers': top_queriers,
             'total_uploads': total_uploads,
             'total_queries': total_queries,
+            'endpoint_metrics': endpoint_metrics,
+            'metrics_workers': metrics_workers,
+            'component_stats': [
+                {'source': source, 'values': ', '.join(f'{name} {value}' for name, value in sorted(values.items()))}
+                for source, values in sorted(component_stats.items())
+            ],
             'opts': self.model._meta,
         }
         return render(request, 'admin/users/user/dashboard.html', context)
@@ -154,9 +134,22 @@ class UserAdmin(BaseUserAdmin):
 class VideoUploadRecordAdmin(admin.ModelAdmin):
     list_display = ['user', 'brand', 'model', 'title', 'filename', 'created_at']
     list_filter = ['brand', 'created_at']
-    search_fields = ['user__username', 'title', 'model', 'filename']
+    search_fields = ['user__username', 'title', 'model', 'filename', 'upload_sha256']
     ordering = ['-created_at']
-    readonly_fields = ['user', 'brand', 'model', 'title', 'filename', 'file_path', 'created_at']
+    readonly_fields = ['user', 'brand', 'model', 'title', 'filename', 'file_path', 'upload_sha256', 'created_at']
+
+
+class ExportRangeForm(forms.Form):
+    start = forms.RegexField(label='From (YYYY-MM)', regex=r'^\d{4}-\d{2}$', required=False)
+    end = forms.RegexField(label='To (YYYY-MM)', regex=r'^\d{4}-\d{2}$', required=False)
+    username = forms.CharField(label='Username', required=False)
+
+
+class Echo:
+    """供 csv.writer 使用的伪文件，write 直接返回写入内容"""
+
+    def write(self, value):
+        return value
 
 
 @admin.register(QueryLog)
@@ -166,3 +159,71 @@ class QueryLogAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'keyword']
     ordering = ['-created_at']
     readonly_fields = ['user', 'mode', 'brand', 'keyword', 'created_at']
+    list_select_related = ['user']
+    date_hierarchy = 'created_at'
+
+    change_list_template = 'admin/users/querylog/change_list.html'
+
+    def get_urls(self):
+        from django.urls import path
+        urls = super().get_urls()
+        custom_urls = [
+            path('export/', self.admin_site.admin_view(self.export_view), name='users_querylog_export'),
+        ]
+        return custom_urls + urls
+
+    def export_view(self, request):
+        """导出查询日志（归档 + 数据库中的热数据），CSV 流式输出"""
+        from django.shortcuts import render
+
+        form = ExportRangeForm(request.GET or None)
+        if 'download' in request.GET and form.is_valid():
+            return self._export_csv(**form.cleaned_data)
+
+        context = {
+            'title': 'Export Query Logs',
+            'form': form,
+            'archives': [
+                {'month': month, 'size_mb': round(size / 1024 / 1024, 2)}
+                for month, size in archive_months()
+            ],
+            'hot_count': QueryLog.objects.count(),
+            'retention_days': getattr(settings, 'QUERY_LOG_RETENTION_DAYS', 90),
+            'opts': self.model._meta,
+        }
+        return render(request, 'admin/users/querylog/export.html', context)
+
+    def _export_csv(self, start, end, username):
+        import csv
+        from django.http import StreamingHttpResponse
+        from django.utils import timezone
+
+        def rows():
+            yield ARCHIVE_FIELDS
+            for month, _size in archive_months():
+                if (start and month < start) or (end and month > end):
+                    continue
+                for row in iter_archived(month):
+                    if username and row['username'] != username:
+                        continue
+                    yield [row[f] if f != 'created_at' else timezone.localtime(row[f]).isoformat()
+                           for f in ARCHIVE_FIELDS]
+            live = QueryLog.objects.select_related('user').order_by('id')
+            if start:
+                live = live.filter(created_at__gte=month_range(start)[0])
+            if end:
+                live = live.filter(created_at__lt=month_range(end)[1])
+            if username:
+                live = live.filter(user__username=username)
+            for log in live.iterator(chunk_size=2000):
+                yield [log.id, log.user_id, log.user.username, log.mode, log.brand, log.keyword,
+                       timezone.localtime(log.created_at).isoformat()]
+
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in rows()),
+            content_type='text/csv; charset=utf-8',
+        )
+        name = f"querylog-{start or 'all'}-{end or 'now'}.csv"
+        response['Content-Disposition'] = f'attachment; filename="{name}"'
+        return response
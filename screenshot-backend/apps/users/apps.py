@@ -4,3 +4,6 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
     verbose_name = 'User Management'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -1,8 +1,15 @@
 from rest_framework.authentication import SessionAuthentication
 
+from config.metrics import timer
+
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
     """禁用 CSRF 检查的 Session 认证"""
 
+    def authenticate(self, request):
+        # 包含读取会话和用户（缓存未命中时查库）的耗时
+        with timer('auth'):
+            return super().authenticate(request)
+
     def enforce_csrf(self, request):
         return  # 不执行 CSRF 检查
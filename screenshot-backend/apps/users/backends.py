@@ -0,0 +1,34 @@
+"""带缓存的用户认证后端
+
+每个已登录请求都要按会话中的用户 ID 取一次 User。这里把用户对象缓存在
+AUTH_CACHE_ALIAS 指定的缓存中，用户保存或删除时（修改密码、禁用、更新资料、
+登录时更新 last_login）由信号清除对应缓存，会话校验用的密码哈希始终是最新的。
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+
+def _cache():
+    return caches[getattr(settings, 'AUTH_CACHE_ALIAS', 'default')]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    _cache().delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """get_user 先查缓存，未命中时查数据库并写入缓存"""
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = _cache().get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                _cache().set(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+        return user
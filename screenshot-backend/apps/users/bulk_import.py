@@ -0,0 +1,124 @@
+"""Excel 批量导入用户
+
+工作簿以 read_only 模式逐行读取；已有用户名一次查询取出；密码哈希由 hashing 模块
+多进程计算；新用户按 USER_IMPORT_BATCH_SIZE 分批 bulk_create。
+每一行的结果（新建 / 跳过原因）都记录在 ImportResult 中，dry_run 时只校验不写入。
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from openpyxl import load_workbook
+
+from .hashing import hash_passwords
+from .models import User
+
+DEFAULT_PASSWORD = 'password123'
+
+
+class ImportResult:
+    """导入结果：created 为新建（dry_run 时为可新建）的行，errors 为 [(行号, 用户名, 原因)]"""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.created = []
+        self.errors = []
+
+    @property
+    def created_count(self):
+        return len(self.created)
+
+    def error(self, row_num, username, message):
+        self.errors.append((row_num, username, message))
+
+
+def _cell(row, index):
+    value = row[index] if len(row) > index else None
+    return str(value).strip() if value is not None else ''
+
+
+def read_rows(excel_file):
+    """逐行读取工作簿（第一行为表头），产出 (行号, 用户名, 密码, 手机号, 部门)"""
+    wb = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+            if not row or not row[0]:
+                continue
+            username = User.normalize_username(_cell(row, 0))
+            if not username:
+                continue
+            password = _cell(row, 1) or DEFAULT_PASSWORD
+            yield row_num, username, password, _cell(row, 2), _cell(row, 3)
+    finally:
+        wb.close()
+
+
+def _validate(username, phone, department):
+    if len(username) > User._meta.get_field('username').max_length:
+        raise ValidationError('Username is too long')
+    User.username_validator(username)
+    if len(phone) > User._meta.get_field('phone').max_length:
+        raise ValidationError('Phone is too long')
+    if len(department) > User._meta.get_field('department').max_length:
+        raise ValidationError('Department is too long')
+
+
+def _insert(users, batch_size, result):
+    """写入一批用户；与并发创建的用户冲突时剔除冲突行后重试"""
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([user for _row_num, user in users], batch_size=batch_size)
+    except IntegrityError:
+        taken = set(User.objects.filter(
+            username__in=[user.username for _row_num, user in users]
+        ).values_list('username', flat=True))
+        if not taken:
+            raise
+        for row_num, user in users:
+            if user.username in taken:
+                result.error(row_num, user.username, f'Username {user.username} already exists')
+        users = [(row_num, user) for row_num, user in users if user.username not in taken]
+        if users:
+            _insert(users, batch_size, result)
+        return
+    result.created.extend((row_num, user.username) for row_num, user in users)
+
+
+def import_users(excel_file, dry_run=False):
+    """从 Excel 导入用户，返回 ImportResult；文件无法读取时抛出异常"""
+    batch_size = getattr(settings, 'USER_IMPORT_BATCH_SIZE', 500)
+    workers = getattr(settings, 'USER_IMPORT_HASH_WORKERS', 4)
+    result = ImportResult(dry_run)
+
+    existing = set(User.objects.values_list('username', flat=True))
+    seen = {}
+    valid = []
+    for row_num, username, password, phone, department in read_rows(excel_file):
+        if username in existing:
+            result.error(row_num, username, f'Username {username} already exists')
+            continue
+        if username in seen:
+            result.error(row_num, username, f'Duplicate of row {seen[username]}')
+            continue
+        try:
+            _validate(username, phone, department)
+        except ValidationError as e:
+            result.error(row_num, username, '; '.join(e.messages))
+            continue
+        seen[username] = row_num
+        valid.append((row_num, username, password, phone, department))
+
+    if dry_run:
+        result.created = [(row_num, username) for row_num, username, *_rest in valid]
+        result.errors.sort()
+        return result
+
+    hashes = hash_passwords([password for _r, _u, password, _p, _d in valid], workers)
+    users = [
+        (row_num, User(username=username, password=encoded, phone=phone, department=department))
+        for (row_num, username, _password, phone, department), encoded in zip(valid, hashes)
+    ]
+    for start in range(0, len(users), batch_size):
+        _insert(users[start:start + batch_size], batch_size, result)
+    result.errors.sort()
+    return result
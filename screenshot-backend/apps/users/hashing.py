@@ -0,0 +1,33 @@
+"""多进程批量计算密码哈希（批量导入用户时使用）
+
+PBKDF2 每次哈希要几百毫秒，逐个计算时几千个用户会超过请求超时。
+主进程取得默认 hasher 并生成盐，子进程只调用 hasher.encode，不需要加载 Django 配置，
+所以这个模块不能导入模型。
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from django.contrib.auth.hashers import get_hasher
+
+HASH_CHUNK_SIZE = 16
+
+
+def _encode(hasher, items):
+    return [hasher.encode(password, salt) for password, salt in items]
+
+
+def hash_passwords(passwords, workers):
+    """按 PASSWORD_HASHERS 中的默认算法计算哈希，返回与 passwords 顺序一致的列表"""
+    hasher = get_hasher('default')
+    items = [(password, hasher.salt()) for password in passwords]
+    if workers <= 1 or len(items) <= HASH_CHUNK_SIZE:
+        return _encode(hasher, items)
+
+    chunks = [items[i:i + HASH_CHUNK_SIZE] for i in range(0, len(items), HASH_CHUNK_SIZE)]
+    # gunicorn worker 是多线程进程，用 spawn 避免 fork 带来的锁问题
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)),
+        mp_context=multiprocessing.get_context('spawn'),
+    ) as pool:
+        return [encoded for chunk in pool.map(_encode, repeat(hasher), chunks) for encoded in chunk]
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.users.query_archive import archive_query_logs, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = '把超出保留期的查询日志按月移入压缩归档文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='数据库保留最近 N 天，默认 QUERY_LOG_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='每批归档条数，默认 QUERY_LOG_ARCHIVE_BATCH_SIZE')
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不归档')
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['days'])
+        moved = archive_query_logs(cutoff, options['batch_size'], options['dry_run'])
+        for month, count in sorted(moved.items()):
+            self.stdout.write(f'{month}: {count}')
+
+        action = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {sum(moved.values())} query logs older than {cutoff:%Y-%m-%d %H:%M} '
+            f'to {settings.QUERY_LOG_ARCHIVE_ROOT}'
+        ))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.users.rollups import rebuild_query_rollups, rebuild_upload_rollups
+
+
+class Command(BaseCommand):
+    help = '按查询日志和上传记录重算统计面板的按天汇总表'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='只重算最近 N 天（含今天），默认全部重算')
+
+    def handle(self, *args, **options):
+        start = None
+        if options['days'] is not None:
+            start = timezone.localdate() - timedelta(days=max(options['days'], 1) - 1)
+
+        queries = rebuild_query_rollups(start)
+        uploads = rebuild_upload_rollups(start)
+        since = f' since {start}' if start else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {queries} query rollups and {uploads} upload rollups{since}'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.rollups import reconcile_user_counters
+
+
+class Command(BaseCommand):
+    help = '按上传记录和查询汇总表校正用户的上传/查询次数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只列出差异，不修改')
+
+    def handle(self, *args, **options):
+        changes = reconcile_user_counters(options['dry_run'])
+        for username, field, old, new in changes:
+            self.stdout.write(f'{username}: {field} {old} -> {new}')
+
+        action = 'Would fix' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{action} {len(changes)} counters'))
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_querylog_videouploadrecord'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='querylog',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Query Log', 'verbose_name_plural': 'Query Logs'},
+        ),
+        migrations.AlterModelOptions(
+            name='user',
+            options={'verbose_name': 'User', 'verbose_name_plural': 'Users'},
+        ),
+        migrations.AlterModelOptions(
+            name='videouploadrecord',
+            options={'ordering': ['-created_at'], 'verbose_name': 'Video Upload', 'verbose_name_plural': 'Video Uploads'},
+        ),
+        migrations.AlterField(
+            model_name='querylog',
+            name='brand',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Brand'),
+        ),
+        migrations.AlterField(
+            model_name='querylog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Query Time'),
+        ),
+        migrations.AlterField(
+            model_name='querylog',
+            name='keyword',
+            field=models.CharField(blank=True, max_length=200, verbose_name='Keyword'),
+        ),
+        migrations.AlterField(
+            model_name='querylog',
+            name='mode',
+            field=models.CharField(choices=[('Error Code', 'Error Code'), ('Component IO Check', 'Component IO Check'), ('Video Tutorial', 'Video Tutorial')], max_length=50, verbose_name='Mode'),
+        ),
+        migrations.AlterField(
+            model_name='querylog',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='query_logs', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='department',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Department'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='phone',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Phone'),
+        ),
+        migrations.AlterField(
+            model_name='videouploadrecord',
+            name='brand',
+            field=models.CharField(max_length=50, verbose_name='Brand'),
+        ),
+        migrations.AlterField(
+            model_name='videouploadrecord',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Upload Time'),
+        ),
+        migrations.AlterField(
+            model_name='videouploadrecord',
+            name='file_path',
+            field=models.CharField(max_length=500, verbose_name='File Path'),
+        ),
+        migrations.AlterField(
+            model_name='videouploadrecord',
+            name='filename',
+            field=models.CharField(max_length=255, verbose_name='Filename'),
+        ),
+        migrations.AlterField(
+            model_name='videouploadrecord',
+            name='model',
+            field=models.CharField(max_length=100, verbose_name='Model'),
+        ),
+        migrations.AlterField(
+            model_name='videouploadrecord',
+            name='title',
+            field=models.CharField(max_length=200, verbose_name='Video Title'),
+        ),
+        migrations.AlterField(
+            model_name='videouploadrecord',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+    ]
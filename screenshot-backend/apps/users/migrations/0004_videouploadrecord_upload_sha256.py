@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_querylog_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videouploadrecord',
+            name='upload_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Upload SHA-256'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """按已有明细生成汇总"""
+    for source, stat, fields in [
+        ('QueryLog', 'DailyQueryStat', ['mode', 'brand', 'user_id']),
+        ('VideoUploadRecord', 'DailyUploadStat', ['brand', 'user_id']),
+    ]:
+        source = apps.get_model('users', source)
+        stat = apps.get_model('users', stat)
+        grouped = source.objects.annotate(day=TruncDate('created_at')).values('day', *fields).annotate(n=Count('id'))
+        stat.objects.bulk_create([
+            stat(day=row['day'], count=row['n'], **{f: row[f] for f in fields})
+            for row in grouped.order_by()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_videouploadrecord_upload_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyQueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('mode', models.CharField(max_length=50, verbose_name='Mode')),
+                ('brand', models.CharField(blank=True, max_length=50, verbose_name='Brand')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Count')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_query_stats', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Daily Query Stat',
+                'verbose_name_plural': 'Daily Query Stats',
+                'constraints': [models.UniqueConstraint(fields=('day', 'mode', 'brand', 'user'), name='unique_daily_query_stat')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyUploadStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('brand', models.CharField(max_length=50, verbose_name='Brand')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Count')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_upload_stats', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Daily Upload Stat',
+                'verbose_name_plural': 'Daily Upload Stats',
+                'constraints': [models.UniqueConstraint(fields=('day', 'brand', 'user'), name='unique_daily_upload_stat')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
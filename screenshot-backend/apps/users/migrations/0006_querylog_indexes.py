@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='querylog',
+            index=models.Index(fields=['created_at'], name='querylog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='querylog',
+            index=models.Index(fields=['mode', 'created_at'], name='querylog_mode_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='querylog',
+            index=models.Index(fields=['user', 'created_at'], name='querylog_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """按上传记录和查询日志填充计数"""
+    User = apps.get_model('users', 'User')
+    VideoUploadRecord = apps.get_model('users', 'VideoUploadRecord')
+    QueryLog = apps.get_model('users', 'QueryLog')
+    uploads = VideoUploadRecord.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(n=Count('id'))
+    queries = QueryLog.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(n=Count('id'))
+    User.objects.update(
+        upload_count=Coalesce(Subquery(uploads.values('n')), 0),
+        query_count=Coalesce(Subquery(queries.values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_querylog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='query_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Queries'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='upload_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Uploads'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,18 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 
 class User(AbstractUser):
     """Extended user model"""
     phone = models.CharField('Phone', max_length=20, blank=True)
     department = models.CharField('Department', max_length=100, blank=True)
+    # 上传/查询次数：数据库中该用户的上传记录、查询日志条数，记录写入和删除时用 F() 原子更新
+    # （见 rollups），查询日志归档后也会扣减；reconcile_user_counters 可按明细校正
+    upload_count = models.PositiveIntegerField('Uploads', default=0, editable=False)
+    query_count = models.PositiveIntegerField('Queries', default=0, editable=False)
+
+    COUNTER_FIELDS = ('upload_count', 'query_count')
 
     class Meta:
         verbose_name = 'User'
@@ -14,6 +21,15 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        # 更新已有用户时不写计数列，避免用读取时的旧值覆盖并发的累加
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class VideoUploadRecord(models.Model):
     """Video upload record"""
@@ -23,6 +39,9 @@ class VideoUploadRecord(models.Model):
     title = models.CharField('Video Title', max_length=200)
     filename = models.CharField('Filename', max_length=255)
     file_path = models.CharField('File Path', max_length=500)
+    # 上传内容的摘要（faststart 之前），也是内容寻址存储中 blob 的键：各分片 (大小, SHA-256)
+    # 列表的 SHA-256（见 blobs.chunk_list_digest），不是磁盘上文件的 SHA-256
+    upload_sha256 = models.CharField('Upload SHA-256', max_length=64, blank=True, db_index=True)
     created_at = models.DateTimeField('Upload Time', auto_now_add=True)
 
     class Meta:
@@ -46,12 +65,50 @@ class QueryLog(models.Model):
     mode = models.CharField('Mode', max_length=50, choices=MODE_CHOICES)
     brand = models.CharField('Brand', max_length=50, blank=True)
     keyword = models.CharField('Keyword', max_length=200, blank=True)
-    created_at = models.DateTimeField('Query Time', auto_now_add=True)
+    # 由请求线程赋值，批量写入时保留实际查询时间
+    created_at = models.DateTimeField('Query Time', default=timezone.now)
 
     class Meta:
         verbose_name = 'Query Log'
         verbose_name_plural = 'Query Logs'
         ordering = ['-created_at']
+        # 后台按时间排序/筛选、按模式筛选、查看单个用户的查询记录
+        indexes = [
+            models.Index(fields=['created_at'], name='querylog_created_idx'),
+            models.Index(fields=['mode', 'created_at'], name='querylog_mode_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='querylog_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.mode} - {self.created_at}"
+
+
+class DailyQueryStat(models.Model):
+    """Daily query rollup (per mode, brand and user)"""
+    day = models.DateField('Day')
+    mode = models.CharField('Mode', max_length=50)
+    brand = models.CharField('Brand', max_length=50, blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_query_stats', verbose_name='User')
+    count = models.PositiveIntegerField('Count', default=0)
+
+    class Meta:
+        verbose_name = 'Daily Query Stat'
+        verbose_name_plural = 'Daily Query Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'mode', 'brand', 'user'], name='unique_daily_query_stat'),
+        ]
+
+
+class DailyUploadStat(models.Model):
+    """Daily upload rollup (per brand and user)"""
+    day = models.DateField('Day')
+    brand = models.CharField('Brand', max_length=50)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_upload_stats', verbose_name='User')
+    count = models.PositiveIntegerField('Count', default=0)
+
+    class Meta:
+        verbose_name = 'Daily Upload Stat'
+        verbose_name_plural = 'Daily Upload Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'brand', 'user'], name='unique_daily_upload_stat'),
+        ]
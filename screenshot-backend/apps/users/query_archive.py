@@ -0,0 +1,169 @@
+"""查询日志归档
+
+QueryLog 只保留最近 QUERY_LOG_RETENTION_DAYS 天（热数据），更早的记录按批次
+移到 QUERY_LOG_ARCHIVE_ROOT 下按月划分的 gzip CSV 文件（querylog-YYYY-MM.csv.gz），
+每批追加为一个 gzip member，先写入并 fsync 归档文件，再删除数据库中的记录。
+中途失败时同一条记录可能在归档中出现两次，读取时按 id 去重。
+统计面板使用按天汇总表（见 rollups），归档不影响统计结果；用户的查询次数
+（User.query_count）是数据库中的日志条数，随归档扣减。
+保留期起点取本地零点，只归档整天；归档涉及的最后一天记在 .archived_through 中，
+rebuild_rollups 不会重算这一天及之前的汇总（这些天的明细已不完整）。
+"""
+import csv
+import fcntl
+import gzip
+import io
+import os
+import re
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import QueryLog
+
+ARCHIVE_FIELDS = ['id', 'user_id', 'username', 'mode', 'brand', 'keyword', 'created_at']
+ARCHIVE_NAME_RE = re.compile(r'^querylog-(\d{4}-\d{2})\.csv\.gz$')
+ARCHIVED_THROUGH_NAME = '.archived_through'
+
+
+def archive_root():
+    return settings.QUERY_LOG_ARCHIVE_ROOT
+
+
+def archive_path(month):
+    """month 为 'YYYY-MM'"""
+    return archive_root() / f'querylog-{month}.csv.gz'
+
+
+def archive_months():
+    """返回已归档的 [(月份, 文件大小)]，按月份升序"""
+    root = archive_root()
+    if not root.exists():
+        return []
+    months = []
+    for entry in os.scandir(root):
+        match = ARCHIVE_NAME_RE.match(entry.name)
+        if match:
+            months.append((match.group(1), entry.stat().st_size))
+    return sorted(months)
+
+
+def month_range(month):
+    """'YYYY-MM' 对应的本地时间 [月初, 下月初)"""
+    start = datetime.strptime(month, '%Y-%m')
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def retention_cutoff(days=None):
+    """热数据窗口起点（N 天前的本地零点），早于该时间的记录会被归档"""
+    if days is None:
+        days = getattr(settings, 'QUERY_LOG_RETENTION_DAYS', 90)
+    day = timezone.localdate() - timedelta(days=days)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def archived_through():
+    """归档涉及的最后一天（本地日期），从未归档时返回 None"""
+    try:
+        return date.fromisoformat((archive_root() / ARCHIVED_THROUGH_NAME).read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _mark_archived_through(day):
+    current = archived_through()
+    if current is not None and current >= day:
+        return
+    path = archive_root() / ARCHIVED_THROUGH_NAME
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(day.isoformat())
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _archive_lock():
+    root = archive_root()
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / '.lock', 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _row(log):
+    return [log.id, log.user_id, log.user.username, log.mode, log.brand, log.keyword,
+            log.created_at.isoformat()]
+
+
+def _append(month, rows):
+    path = archive_path(month)
+    is_new = not path.exists()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if is_new:
+        writer.writerow(ARCHIVE_FIELDS)
+    writer.writerows(rows)
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(buffer.getvalue().encode('utf-8')))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def archive_query_logs(before=None, batch_size=None, dry_run=False):
+    """把 created_at 早于 before 的查询日志移入月度归档，返回 {月份: 条数}"""
+    if before is None:
+        before = retention_cutoff()
+    if batch_size is None:
+        batch_size = getattr(settings, 'QUERY_LOG_ARCHIVE_BATCH_SIZE', 5000)
+    old = QueryLog.objects.filter(created_at__lt=before)
+    moved = {}
+    if dry_run:
+        for log in old.only('created_at').order_by().iterator():
+            month = timezone.localtime(log.created_at).strftime('%Y-%m')
+            moved[month] = moved.get(month, 0) + 1
+        return moved
+
+    with _archive_lock():
+        while True:
+            batch = list(old.select_related('user').order_by('id')[:batch_size])
+            if not batch:
+                break
+            by_month = {}
+            for log in batch:
+                month = timezone.localtime(log.created_at).strftime('%Y-%m')
+                by_month.setdefault(month, []).append(_row(log))
+            for month, rows in by_month.items():
+                _append(month, rows)
+                moved[month] = moved.get(month, 0) + len(rows)
+            # rollups 导入了本模块，这里延迟导入
+            from .rollups import remove_query_counts
+            with transaction.atomic():
+                # 直接 DELETE，不逐条触发 post_delete，查询次数按用户批量扣减
+                QueryLog.objects.filter(id__in=[log.id for log in batch])._raw_delete(QueryLog.objects.db)
+                remove_query_counts(batch)
+        if moved:
+            # before 不在零点时它所在的那天也只剩部分明细
+            _mark_archived_through(timezone.localdate(before - timedelta(microseconds=1)))
+    return moved
+
+
+def iter_archived(month):
+    """按行读取某月的归档，产出字典（created_at 为 datetime），按 id 去重"""
+    path = archive_path(month)
+    if not path.exists():
+        return
+    seen = set()
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            if row['id'] in seen:
+                continue
+            seen.add(row['id'])
+            row['created_at'] = parse_datetime(row['created_at'])
+            yield row
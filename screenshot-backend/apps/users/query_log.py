@@ -0,0 +1,202 @@
+"""查询日志异步批量写入
+
+每个 worker 进程维护一个有界队列，请求线程只负责入队，后台线程按条数或时间阈值
+用 bulk_create 批量写入，避免每个查询请求都在 SQLite 上抢写锁。
+写入的同时在同一事务中更新按天汇总表（见 rollups）。
+进程退出时会把队列中剩余的日志写完。QUERY_LOG_ASYNC = False 时退化为同步写入（测试用）。
+批量搜索用 log_queries 一次记录多条，同步写入时也只有一次 bulk_create。
+队列长度、丢弃条数和写入耗时登记到 config.metrics，出现在 /api/metrics/ 和后台统计面板中。
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from config.metrics import register_stats, timer
+
+from .models import QueryLog
+from .rollups import record_query_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class QueryLogWriter:
+    """有界队列 + 后台线程批量写入"""
+
+    def __init__(self, queue_size=10000, batch_size=200, flush_interval=2.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.flush_seconds_max = 0.0
+
+    def start(self):
+        with self._started_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-log-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def put(self, entry):
+        """入队一条未保存的 QueryLog，队列满时丢弃并计数"""
+        self.put_many([entry])
+
+    def put_many(self, entries):
+        """入队多条未保存的 QueryLog，队列满时丢弃剩余部分并计数"""
+        if self._thread is None:
+            self.start()
+        enqueued = 0
+        for entry in entries:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                break
+            enqueued += 1
+        with self._stats_lock:
+            self.enqueued += enqueued
+            self.dropped += len(entries) - enqueued
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        if not batch:
+            return
+        started = time.monotonic()
+        try:
+            with transaction.atomic():
+                QueryLog.objects.bulk_create(batch, batch_size=self.batch_size)
+                record_query_rollups(batch)
+        except Exception:
+            with self._stats_lock:
+                self.failed += len(batch)
+            logger.exception('Failed to write %d query logs', len(batch))
+        else:
+            with self._stats_lock:
+                self.flushed += len(batch)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._stats_lock:
+                self.flushes += 1
+                self.flush_seconds += elapsed
+                self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+
+    def flush(self):
+        """把队列中的日志全部写入数据库"""
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                self._write(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            batch = []
+            # 攒够 batch_size 条或等到 flush_interval 到期后写一批
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch:
+                with self._flush_lock:
+                    self._write(batch)
+                close_old_connections()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def stats(self):
+        """累计条数、当前队列长度和批量写入耗时（秒）"""
+        with self._stats_lock:
+            return {
+                'enqueued': self.enqueued,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'pending': self._queue.qsize(),
+                'flushes': self.flushes,
+                'flush_seconds': round(self.flush_seconds, 6),
+                'flush_seconds_max': round(self.flush_seconds_max, 6),
+            }
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_query_log_writer():
+    """返回当前进程的日志写入器"""
+    global _writer, _writer_pid
+    if _writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer_pid != os.getpid():
+                _writer = QueryLogWriter(
+                    queue_size=getattr(settings, 'QUERY_LOG_QUEUE_SIZE', 10000),
+                    batch_size=getattr(settings, 'QUERY_LOG_BATCH_SIZE', 200),
+                    flush_interval=getattr(settings, 'QUERY_LOG_FLUSH_INTERVAL', 2.0),
+                )
+                _writer_pid = os.getpid()
+    return _writer
+
+
+register_stats('query_log', lambda: get_query_log_writer().stats())
+
+
+def log_query(user, mode, brand='', keyword=''):
+    """记录一条查询日志"""
+    log_queries(user, mode, brand, [keyword])
+
+
+def log_queries(user, mode, brand, keywords):
+    """记录一批查询日志（每个关键词一条）"""
+    with timer('log'):
+        _log_queries(user, mode, brand, keywords)
+
+
+def _log_queries(user, mode, brand, keywords):
+    created_at = timezone.now()
+    entries = [QueryLog(
+        user_id=user.id,
+        mode=mode,
+        brand=brand,
+        keyword=keyword,
+        created_at=created_at,
+    ) for keyword in keywords]
+    if not entries:
+        return
+    if not getattr(settings, 'QUERY_LOG_ASYNC', True):
+        with transaction.atomic():
+            QueryLog.objects.bulk_create(entries)
+            record_query_rollups(entries)
+        return
+    get_query_log_writer().put_many(entries)
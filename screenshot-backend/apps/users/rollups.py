@@ -0,0 +1,148 @@
+"""后台统计的按天汇总表
+
+DailyQueryStat 按 (日期, 模式, 品牌, 用户) 记录查询次数，DailyUploadStat 按
+(日期, 品牌, 用户) 记录上传次数。查询日志批量写入、上传记录创建/删除时增量更新，
+统计面板只读汇总表，不再对 QueryLog / VideoUploadRecord 做全表聚合。
+汇总表与明细不一致时（例如直接改库）可用 rebuild_rollups 命令按明细重算。
+日期按 TIME_ZONE 本地日期划分。
+
+同一事务中还会累加 User.upload_count / query_count，用户列表和排行直接读取。
+两者都是数据库中现有明细的条数：上传记录、查询日志被删除（包括查询日志归档）时扣减。
+按天汇总表则保留已归档查询日志的统计。
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyQueryStat, DailyUploadStat, QueryLog, User, VideoUploadRecord
+from .query_archive import archived_through
+
+
+def _add(model, lookup, n):
+    """汇总行 count 加 n，行不存在时创建"""
+    if model.objects.filter(**lookup).update(count=F('count') + n):
+        if n < 0:
+            model.objects.filter(count=0, **lookup).delete()
+        return
+    if n < 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=n, **lookup)
+    except IntegrityError:
+        # 其他进程刚创建了同一行
+        model.objects.filter(**lookup).update(count=F('count') + n)
+
+
+def _add_user_counter(field, user_id, n):
+    users = User.objects.filter(id=user_id)
+    if n < 0:
+        users = users.filter(**{f'{field}__gte': -n})
+    users.update(**{field: F(field) + n})
+
+
+def record_query_rollups(logs):
+    """把一批已写入的 QueryLog 计入汇总表"""
+    counts = Counter(
+        (timezone.localdate(log.created_at), log.mode, log.brand, log.user_id)
+        for log in logs
+    )
+    for (day, mode, brand, user_id), n in counts.items():
+        _add(DailyQueryStat, {'day': day, 'mode': mode, 'brand': brand, 'user_id': user_id}, n)
+    for user_id, n in Counter(log.user_id for log in logs).items():
+        _add_user_counter('query_count', user_id, n)
+
+
+def remove_query_counts(logs):
+    """查询日志被删除或归档时扣减 User.query_count（按天汇总保留，不扣减）"""
+    for user_id, n in Counter(log.user_id for log in logs).items():
+        _add_user_counter('query_count', user_id, -n)
+
+
+def record_upload_rollup(record, n=1):
+    """上传记录创建（n=1）或删除（n=-1）时更新汇总表"""
+    _add(DailyUploadStat, {
+        'day': timezone.localdate(record.created_at),
+        'brand': record.brand,
+        'user_id': record.user_id,
+    }, n)
+    _add_user_counter('upload_count', record.user_id, n)
+
+
+def _rebuild(source, stat, fields, start):
+    rows = source.objects.all()
+    stats = stat.objects.all()
+    if start is not None:
+        start_time = timezone.make_aware(datetime.combine(start, time.min))
+        rows = rows.filter(created_at__gte=start_time)
+        stats = stats.filter(day__gte=start)
+    grouped = rows.annotate(day=TruncDate('created_at')).values('day', *fields).annotate(n=Count('id'))
+    objs = [
+        stat(day=row['day'], count=row['n'], **{f: row[f] for f in fields})
+        for row in grouped.order_by()
+    ]
+    with transaction.atomic():
+        stats.delete()
+        stat.objects.bulk_create(objs, batch_size=1000)
+    return len(objs)
+
+
+def rebuild_query_rollups(start=None):
+    """按 QueryLog 明细重算 start（含）之后的查询汇总，返回汇总行数
+
+    早于最早一条明细的日期、以及归档涉及的最后一天（archived_through）及之前都不重算，
+    这些天的明细已部分或全部归档，保留原有汇总。
+    """
+    earliest = QueryLog.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if earliest is None:
+        return 0
+    floor = timezone.localdate(earliest)
+    through = archived_through()
+    if through is not None and through >= floor:
+        floor = through + timedelta(days=1)
+    if start is None or start < floor:
+        start = floor
+    return _rebuild(QueryLog, DailyQueryStat, ['mode', 'brand', 'user_id'], start)
+
+
+def rebuild_upload_rollups(start=None):
+    """按 VideoUploadRecord 重算 start（含）之后的上传汇总，返回汇总行数"""
+    return _rebuild(VideoUploadRecord, DailyUploadStat, ['brand', 'user_id'], start)
+
+
+def reconcile_user_counters(dry_run=False):
+    """按上传记录和查询日志校正用户计数，返回 [(用户名, 字段, 原值, 正确值)]
+
+    上传次数取上传记录条数，查询次数取数据库中的查询日志条数（已归档的不计入）。
+    统计与写入在同一事务中完成，期间的并发累加不会丢失。
+    """
+    with transaction.atomic():
+        return _reconcile_user_counters(dry_run)
+
+
+def _reconcile_user_counters(dry_run):
+    uploads = dict(
+        VideoUploadRecord.objects.order_by().values('user_id').annotate(n=Count('id')).values_list('user_id', 'n')
+    )
+    queries = dict(
+        QueryLog.objects.order_by().values('user_id').annotate(n=Count('id')).values_list('user_id', 'n')
+    )
+    changes = []
+    changed_users = []
+    for user in User.objects.only('id', 'username', *User.COUNTER_FIELDS).iterator():
+        expected = {'upload_count': uploads.get(user.id, 0), 'query_count': queries.get(user.id, 0)}
+        diff = {f: v for f, v in expected.items() if getattr(user, f) != v}
+        if not diff:
+            continue
+        for field, value in diff.items():
+            changes.append((user.username, field, getattr(user, field), value))
+            setattr(user, field, value)
+        changed_users.append(user)
+    if not dry_run:
+        # bulk_update 绕过 User.save，直接写计数列
+        User.objects.bulk_update(changed_users, list(User.COUNTER_FIELDS), batch_size=500)
+    return changes
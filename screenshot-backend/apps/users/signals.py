@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_user
+from .models import QueryLog, User, VideoUploadRecord
+from .rollups import record_upload_rollup, remove_query_counts
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """用户变更后清除认证缓存"""
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=VideoUploadRecord)
+def add_upload_rollup(sender, instance, created, **kwargs):
+    """新上传记录计入按天汇总"""
+    if created:
+        record_upload_rollup(instance)
+
+
+@receiver(post_delete, sender=VideoUploadRecord)
+def remove_upload_rollup(sender, instance, **kwargs):
+    """删除上传记录时从按天汇总中扣除"""
+    record_upload_rollup(instance, -1)
+
+
+@receiver(post_delete, sender=QueryLog)
+def remove_query_count(sender, instance, **kwargs):
+    """删除查询日志时扣减用户的查询次数（归档时由 query_archive 按批扣减）"""
+    remove_query_counts([instance])
@@ -1,4 +1,4 @@
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework.views import APIView
@@ -68,6 +68,8 @@ class ChangePasswordView(APIView):
 
         user.set_password(new_password)
         user.save()
+        # 保存时清除了用户缓存，其他会话因密码哈希不符失效；当前会话更新哈希后保持登录
+        update_session_auth_hash(request, user)
         return Response({'message': 'Password changed successfully'})
 
 
@@ -0,0 +1 @@
+"""性能基准脚本（不参与线上运行）"""
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+"""API 接口延迟与吞吐基准
+
+默认在进程内直接调用 Django 的 WSGI 应用（不经过网络和 gunicorn）：使用临时数据库和
+benchmarks.tree 生成的临时截图目录（或 --root 指定的已有目录），登录一个基准用户后
+依次压测各接口，统计 p50/p95/p99 延迟和吞吐。
+指定 --url 时改为请求正在运行的服务（如 gunicorn），需要 --username/--password。
+
+请求参数（品牌、型号、JSON 文件名等）通过接口本身获取，两种方式使用同一套逻辑。
+结果写入 JSON（--output），--compare 与之前的结果对比。
+
+用法: python -m benchmarks.endpoints [--requests 200] [--concurrency 4] [--output result.json]
+      python -m benchmarks.endpoints --url http://127.0.0.1:8000 --username u --password p
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+from wsgiref.util import setup_testing_defaults
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.tree import COMPONENT_MODE, VIDEO_MODE, add_arguments, generate_tree, tree_options  # noqa: E402
+
+API = '/api/screenshots/'
+ENDPOINTS = ['modes', 'brands', 'models', 'search', 'components', 'component-data', 'videos']
+KEYWORDS = ['0', '1', '01', '12', '-3', '005', '9-9', 'E0', '00-1', 'zzz']
+SEARCH_PAGE_SIZE = 50
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+# ---------- 客户端 ----------
+
+class InProcessClient:
+    """直接调用 WSGI 应用，Cookie 由客户端自己保存"""
+
+    def __init__(self, app):
+        self.app = app
+        self.cookies = {}
+
+    def request(self, method, path, params=None, body=None):
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(params or {}),
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': 'localhost',
+            'wsgi.input': io.BytesIO(body or b''),
+        }
+        if body is not None:
+            environ['CONTENT_TYPE'] = 'application/json'
+            environ['CONTENT_LENGTH'] = str(len(body))
+        if self.cookies:
+            environ['HTTP_COOKIE'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        setup_testing_defaults(environ)
+
+        status = {}
+
+        def start_response(status_line, headers, exc_info=None):
+            status['code'] = int(status_line.split(' ', 1)[0])
+            status['headers'] = headers
+
+        result = self.app(environ, start_response)
+        try:
+            data = b''.join(result)
+        finally:
+            # 触发 request_finished（关闭数据库连接等），与真实服务器一致
+            if hasattr(result, 'close'):
+                result.close()
+        for name, value in status['headers']:
+            if name.lower() == 'set-cookie':
+                key, _sep, rest = value.partition('=')
+                self.cookies[key] = rest.split(';', 1)[0]
+        return status['code'], data
+
+
+class LiveClient:
+    """请求运行中的服务，每个线程一个 keep-alive 连接"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.cookies = {}
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.netloc, timeout=60)
+        return conn
+
+    def request(self, method, path, params=None, body=None):
+        url = self.prefix + path
+        if params:
+            url += '?' + urlencode(params)
+        headers = {}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # 服务端关闭了 keep-alive 连接，重连一次
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        for value in response.headers.get_all('Set-Cookie') or []:
+            key, _sep, rest = value.partition('=')
+            self.cookies[key] = rest.split(';', 1)[0]
+        return response.status, data
+
+
+def login(client, username, password):
+    body = json.dumps({'username': username, 'password': password}).encode()
+    status, data = client.request('POST', '/api/users/login/', body=body)
+    if status != 200:
+        raise SystemExit(f'Login failed ({status}): {data[:200]!r}')
+
+
+def get_json(client, endpoint, **params):
+    status, data = client.request('GET', API + endpoint + '/', params)
+    if status != 200:
+        raise SystemExit(f'{endpoint}/ returned {status}: {data[:200]!r}')
+    return json.loads(data)
+
+
+# ---------- 请求参数 ----------
+
+def discover_targets(client, rng, keywords):
+    """通过列表接口获取各被测接口的参数组合：{接口: [参数字典, ...]}"""
+    modes = get_json(client, 'modes')['modes']
+    brands = {mode: get_json(client, 'brands', mode=mode)['brands'] for mode in modes}
+    image_modes = [m for m in modes if m not in (COMPONENT_MODE, VIDEO_MODE)]
+
+    models = []
+    for mode in image_modes:
+        for brand in brands[mode]:
+            for model in get_json(client, 'models', mode=mode, brand=brand)['models']:
+                models.append((mode, brand, model))
+
+    component_files = []
+    for brand in brands.get(COMPONENT_MODE, []):
+        for item in get_json(client, 'components', brand=brand)['files']:
+            component_files.append((brand, item['filename']))
+
+    targets = {
+        'modes': [{}],
+        'brands': [{'mode': mode} for mode in modes],
+        'models': [{'mode': mode, 'brand': brand} for mode in image_modes for brand in brands[mode]],
+        'search': [
+            {'mode': mode, 'brand': brand, 'model': model, 'keyword': keyword, 'limit': SEARCH_PAGE_SIZE}
+            for mode, brand, model in rng.sample(models, min(len(models), 50))
+            for keyword in keywords
+        ],
+        'components': [{'brand': brand} for brand in brands.get(COMPONENT_MODE, [])],
+        'component-data': [{'brand': brand, 'filename': filename} for brand, filename in component_files],
+        'videos': [{'brand': brand} for brand in brands.get(VIDEO_MODE, [])],
+    }
+    return {name: params for name, params in targets.items() if params}
+
+
+# ---------- 压测 ----------
+
+def run_endpoint(client, endpoint, param_list, requests, concurrency, warmup, seed):
+    rng = random.Random(seed)
+    plan = [rng.choice(param_list) for _ in range(requests)]
+    for params in plan[:warmup]:
+        client.request('GET', API + endpoint + '/', params)
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    position = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        local = []
+        failed = 0
+        while True:
+            with lock:
+                i = next(position, None)
+            if i is None:
+                break
+            started = time.perf_counter()
+            try:
+                status, _data = client.request('GET', API + endpoint + '/', plan[i])
+            except Exception:
+                status = 0
+            local.append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        'max_ms': round(max(latencies), 3) if latencies else 0.0,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def setup_in_process(args, workdir):
+    """配置临时数据库和截图目录，返回 (WSGI 应用, 目录说明)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.management import call_command
+    from django.db import connections
+
+    if args.root:
+        root = Path(args.root).resolve()
+        tree = {'root': str(root)}
+    else:
+        root = workdir / 'screenshots'
+        started = time.perf_counter()
+        counts = generate_tree(root, **tree_options(args))
+        print(f"Generated {counts['images']} images, {counts['components']} component files, "
+              f"{counts['videos']} videos in {time.perf_counter() - started:.1f}s")
+        tree = tree_options(args)
+
+    settings.SCREENSHOTS_ROOT = root
+    settings.THUMBNAIL_ROOT = root / '.thumbnails'
+    settings.VIDEO_BLOB_ROOT = root / '.blobs'
+    settings.CACHES['auth']['LOCATION'] = str(workdir / 'auth_cache')
+    connections.settings['default']['NAME'] = str(workdir / 'bench.sqlite3')
+    call_command('migrate', verbosity=0)
+
+    from apps.users.models import User
+    User.objects.create_user(username='bench', password='bench')
+    connections.close_all()
+    return WSGIHandler(), tree
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def print_results(results, baseline=None):
+    header = f"{'endpoint':>15} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}"
+    if baseline:
+        header += f" {'p50 Δ':>8} {'p95 Δ':>8} {'req/s Δ':>8}"
+    print(header)
+    for endpoint, r in results.items():
+        line = (f"{endpoint:>15} {r['requests']:>6} {r['errors']:>4} {r['p50_ms']:>8.2f} "
+                f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['rps']:>8.1f}")
+        base = (baseline or {}).get(endpoint)
+        if base:
+            def delta(key):
+                return f"{(r[key] / base[key] - 1) * 100:+7.1f}%" if base[key] else f"{'-':>8}"
+            line += f" {delta('p50_ms')} {delta('p95_ms')} {delta('rps')}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--requests', type=int, default=200, help='每个接口的请求数')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发线程数')
+    parser.add_argument('--warmup', type=int, default=20, help='每个接口正式计时前的预热请求数')
+    parser.add_argument('--keywords', nargs='+', default=KEYWORDS, help='search/ 使用的关键词')
+    parser.add_argument('--output', help='结果 JSON 文件')
+    parser.add_argument('--compare', help='与之前的结果 JSON 对比')
+    parser.add_argument('--url', help='压测运行中的服务，如 http://127.0.0.1:8000')
+    parser.add_argument('--username', default='bench')
+    parser.add_argument('--password', default='bench')
+    parser.add_argument('--root', help='进程内模式使用已有的截图目录，不生成')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-') as tmp:
+        if args.url:
+            client = LiveClient(args.url)
+            target = args.url
+            tree = None
+        else:
+            app, tree = setup_in_process(args, Path(tmp))
+            client = InProcessClient(app)
+            target = 'in-process'
+
+        login(client, args.username, args.password)
+        rng = random.Random(args.seed)
+        targets = discover_targets(client, rng, args.keywords)
+
+        results = {}
+        for endpoint in args.endpoints:
+            if endpoint not in targets:
+                print(f'{endpoint}: no data, skipped')
+                continue
+            results[endpoint] = run_endpoint(client, endpoint, targets[endpoint], args.requests,
+                                             args.concurrency, args.warmup, args.seed)
+
+        if not args.url:
+            from apps.users.query_log import get_query_log_writer
+            get_query_log_writer().close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['endpoints']
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            'meta': {
+                'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'target': target,
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'requests': args.requests,
+                'concurrency': args.concurrency,
+                'warmup': args.warmup,
+                'tree': tree,
+            },
+            'endpoints': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
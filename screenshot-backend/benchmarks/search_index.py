@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""n-gram 索引与线性扫描的搜索耗时对比（子串搜索与归一化代码匹配）
+
+用法: python -m benchmarks.search_index [--sizes 1000 10000 100000] [--repeat 50]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from apps.screenshots.search_index import NgramIndex, linear_match, linear_search  # noqa: E402
+
+KEYWORDS = ['0', '01', '010', '-311', '005-120', '9-9', 'e1', 'zzz']
+
+
+def make_entries(count, seed=0):
+    """生成类似 005-120、E-010-311 的错误代码文件名"""
+    rng = random.Random(seed)
+    entries = []
+    seen = set()
+    for i in range(count):
+        prefix = rng.choice(['', '', 'E', 'U', 'C'])
+        stem = f'{prefix}{rng.randint(0, 999):03d}-{rng.randint(0, 999):03d}'
+        if rng.random() < 0.1 or stem in seen:
+            stem += f'_{i}'
+        seen.add(stem)
+        entries.append((stem, f'{stem}.jpg', f'Error Code/Bench/Model/{stem}.jpg'))
+    return entries
+
+
+def code_keywords(entries):
+    """从已有代码派生归一化 / 容错匹配的关键词：去分隔符、少补零、空格分隔、相邻交换、错一位、前缀"""
+    stem = next(e[0] for e in entries[len(entries) // 2:] if e[0][:1].isdigit() and '_' not in e[0])
+    head, tail = stem.split('-')
+    swapped = head + tail[1] + tail[0] + tail[2:]
+    wrong = head + tail[:-1] + str((int(tail[-1]) + 1) % 10)
+    return [head + tail, head.lstrip('0') + '-' + tail, f'{head} {tail}', swapped, wrong, f'{head}-{tail[:2]}']
+
+
+def timeit(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'stems':>8} {'keyword':>8} {'hits':>7} {'linear ms':>10} {'index ms':>9} {'speedup':>8}")
+    for size in args.sizes:
+        entries = make_entries(size)
+        started = time.perf_counter()
+        index = NgramIndex(entries)
+        build_ms = (time.perf_counter() - started) * 1000
+        print(f'{size:>8} index build {build_ms:.1f} ms')
+        for keyword in KEYWORDS:
+            expected = linear_search(entries, keyword)
+            actual = index.search(keyword)
+            assert actual == expected, f'result mismatch for {keyword!r}'
+            linear_ms = timeit(lambda: linear_search(entries, keyword), args.repeat)
+            index_ms = timeit(lambda: index.search(keyword), args.repeat)
+            speedup = linear_ms / index_ms if index_ms else float('inf')
+            print(f'{size:>8} {keyword:>8} {len(actual):>7} {linear_ms:>10.3f} {index_ms:>9.3f} {speedup:>7.1f}x')
+        for keyword in code_keywords(entries):
+            expected = linear_match(entries, keyword)
+            page = index.search_page(keyword, limit=50)[0]
+            assert page == expected[:50], f'match mismatch for {keyword!r}'
+            linear_ms = timeit(lambda: linear_match(entries, keyword), max(args.repeat // 10, 1))
+            index_ms = timeit(lambda: index.search_page(keyword, limit=50), args.repeat)
+            speedup = linear_ms / index_ms if index_ms else float('inf')
+            print(f'{size:>8} {keyword:>8} {len(expected):>7} {linear_ms:>10.3f} {index_ms:>9.3f} {speedup:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
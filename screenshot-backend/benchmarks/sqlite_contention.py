@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""SQLite 并发读写基准：默认设置与 WAL/连接复用的对比
+
+写线程不断插入 QueryLog（模拟同步写查询日志），读线程同时执行后台统计和
+上传列表类查询，分别统计两种设置下的延迟分位数和 database is locked 次数：
+
+- default: 不执行 PRAGMA，每次操作后关闭连接（相当于 CONN_MAX_AGE = 0）
+- tuned:   settings.SQLITE_PRAGMAS，连接复用
+
+每种设置使用独立的临时数据库文件（WAL 模式会写入数据库文件头）。
+
+用法: python -m benchmarks.sqlite_contention [--writers 8] [--readers 8] [--seconds 10]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import OperationalError, connection, connections  # noqa: E402
+from django.db.models import Count  # noqa: E402
+
+from apps.users.models import QueryLog, User, VideoUploadRecord  # noqa: E402
+
+MODES = ['Error Code', 'Component IO Check', 'Video Tutorial']
+BRANDS = ['FUJI XEROX', 'FUJI FILM', 'Canon']
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def seed(users, logs):
+    User.objects.bulk_create([User(username=f'bench{i}') for i in range(users)])
+    user_ids = list(User.objects.values_list('id', flat=True))
+    rng = random.Random(0)
+    QueryLog.objects.bulk_create([
+        QueryLog(user_id=rng.choice(user_ids), mode=rng.choice(MODES),
+                 brand=rng.choice(BRANDS), keyword=f'{rng.randint(0, 999):03d}')
+        for _ in range(logs)
+    ], batch_size=1000)
+    VideoUploadRecord.objects.bulk_create([
+        VideoUploadRecord(user_id=rng.choice(user_ids), brand=rng.choice(BRANDS), model='M',
+                          title=f'T{i}', filename=f'v{i}.mp4', file_path=f'/tmp/v{i}.mp4')
+        for i in range(logs // 100)
+    ])
+    return user_ids
+
+
+def run(label, db_path, pragmas, reuse, args):
+    connections.close_all()
+    connections.settings['default']['NAME'] = db_path
+    settings.SQLITE_PRAGMAS = pragmas
+    call_command('migrate', verbosity=0)
+    user_ids = seed(args.users, args.logs)
+    connections.close_all()
+
+    results = {'write': [], 'read': []}
+    errors = {'write': 0, 'read': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def worker(kind, seed_value):
+        rng = random.Random(seed_value)
+        latencies = []
+        failed = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                if kind == 'write':
+                    QueryLog.objects.create(user_id=rng.choice(user_ids), mode=rng.choice(MODES),
+                                            brand=rng.choice(BRANDS), keyword='bench')
+                elif rng.random() < 0.5:
+                    list(QueryLog.objects.values('mode').annotate(count=Count('id')))
+                else:
+                    list(VideoUploadRecord.objects.filter(user_id=rng.choice(user_ids))[:50])
+                latencies.append((time.perf_counter() - started) * 1000)
+            except OperationalError:
+                failed += 1
+            if not reuse:
+                connection.close()
+        connection.close()
+        with lock:
+            results[kind].extend(latencies)
+            errors[kind] += failed
+
+    threads = [threading.Thread(target=worker, args=('write', i)) for i in range(args.writers)]
+    threads += [threading.Thread(target=worker, args=('read', 1000 + i)) for i in range(args.readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for kind in ('write', 'read'):
+        values = results[kind]
+        print(f'{label:>8} {kind:>6} {len(values):>8} {len(values) / args.seconds:>8.0f} '
+              f'{percentile(values, 50):>8.2f} {percentile(values, 95):>8.2f} '
+              f'{percentile(values, 99):>8.2f} {statistics.fmean(values) if values else 0:>8.2f} '
+              f'{errors[kind]:>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--logs', type=int, default=50000, help='预先写入的查询日志条数')
+    args = parser.parse_args()
+
+    tuned = dict(settings.SQLITE_PRAGMAS)
+    print(f"{'config':>8} {'op':>6} {'count':>8} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'mean ms':>8} {'locked':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        run('default', os.path.join(tmp, 'default.sqlite3'), {}, False, args)
+        run('tuned', os.path.join(tmp, 'tuned.sqlite3'), tuned, True, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""生成用于基准测试的截图目录（SCREENSHOTS_ROOT）
+
+目录结构与线上一致：
+- <图片模式>/<品牌>/<型号>/<错误代码>.jpg（图片内容只是占位字节）
+- Component IO Check/<品牌>/<名称>.json（{"title": ..., "data": [记录, ...]}，记录数可配置）
+- Video Tutorial/<品牌>/<标题>.mp4（moov 在前的最小 MP4，mdat 用稀疏文件填充到指定大小）
+
+用法: python -m benchmarks.tree OUTPUT [--brands 5] [--models 20] [--files 2000]
+      [--component-files 10] [--component-records 5000] [--videos 20] [--video-mb 50]
+"""
+import argparse
+import json
+import os
+import random
+import struct
+from pathlib import Path
+
+IMAGE_MODES = ['Error Code']
+COMPONENT_MODE = 'Component IO Check'
+VIDEO_MODE = 'Video Tutorial'
+
+# 占位图片内容（JPEG SOI + EOI），搜索接口只用到文件名
+PLACEHOLDER_IMAGE = b'\xff\xd8\xff\xd9'
+
+MODULES = ['Feeder', 'Fuser', 'Drum', 'Laser', 'Scanner', 'Finisher', 'Duplex', 'Controller']
+LEVELS = ['Info', 'Warning', 'Error', 'Fatal']
+WORDS = ['sensor', 'motor', 'clutch', 'solenoid', 'switch', 'fan', 'heater', 'lamp',
+         'paper', 'jam', 'home', 'position', 'open', 'close', 'front', 'rear', 'tray', 'cover']
+
+
+def brand_names(count):
+    return [f'Bench Brand {i:02d}' for i in range(count)]
+
+
+def model_names(count):
+    return [f'BM-{i:04d}' for i in range(count)]
+
+
+def error_code_names(count, rng):
+    """生成类似 005-120、E-010-311 的不重复错误代码"""
+    names = set()
+    while len(names) < count:
+        prefix = rng.choice(['', '', 'E', 'U', 'C'])
+        names.add(f'{prefix}{rng.randint(0, 999):03d}-{rng.randint(0, 999):03d}')
+    return sorted(names)
+
+
+def component_payload(title, records, rng):
+    data = []
+    for i in range(records):
+        data.append({
+            'name': f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}',
+            'code': f'{rng.randint(0, 999):03d}-{rng.randint(0, 999):03d}',
+            'module': rng.choice(MODULES),
+            'level': rng.choice(LEVELS),
+            'cyclic': rng.random() < 0.2,
+            'desc': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))),
+        })
+    return {'title': title, 'data': data}
+
+
+# ---------- 最小 MP4 ----------
+
+def _box(box_type, payload):
+    return struct.pack('>I4s', len(payload) + 8, box_type) + payload
+
+
+def _full_box(box_type, payload, version=0):
+    return _box(box_type, struct.pack('>I', version << 24) + payload)
+
+
+_MATRIX = struct.pack('>9I', 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+
+
+def _moov(duration_s, width, height, mdat_offset, timescale=1000):
+    duration = int(duration_s * timescale)
+    mvhd = _full_box(b'mvhd', struct.pack('>IIII', 0, 0, timescale, duration)
+                     + struct.pack('>IH10x', 0x10000, 0x100) + _MATRIX + bytes(24) + struct.pack('>I', 2))
+    tkhd = _full_box(b'tkhd', struct.pack('>IIIII8xHHHH', 0, 0, 1, 0, duration, 0, 0, 0, 0)
+                     + _MATRIX + struct.pack('>II', width << 16, height << 16))
+    mdhd = _full_box(b'mdhd', struct.pack('>IIIIHH', 0, 0, timescale, duration, 0x55C4, 0))
+    hdlr = _full_box(b'hdlr', struct.pack('>I4s12x', 0, b'vide') + b'VideoHandler\x00')
+    avc1 = _box(b'avc1', bytes(6) + struct.pack('>H', 1) + bytes(16)
+                + struct.pack('>HH', width, height) + bytes(50))
+    stsd = _full_box(b'stsd', struct.pack('>I', 1) + avc1)
+    stco = _full_box(b'stco', struct.pack('>II', 1, mdat_offset))
+    stbl = _box(b'stbl', stsd + stco)
+    minf = _box(b'minf', stbl)
+    mdia = _box(b'mdia', mdhd + hdlr + minf)
+    trak = _box(b'trak', tkhd + mdia)
+    return _box(b'moov', mvhd + trak)
+
+
+def write_video(path, size, duration_s, width=1280, height=720):
+    """写一个可被 video_meta 解析的 MP4：ftyp + moov + 稀疏的 mdat"""
+    ftyp = _box(b'ftyp', b'isom' + struct.pack('>I', 0x200) + b'isomiso2avc1mp41')
+    # moov 长度与 stco 中的偏移量无关，先按 0 生成一次得到长度
+    moov_len = len(_moov(duration_s, width, height, 0))
+    mdat_offset = len(ftyp) + moov_len + 8
+    head = ftyp + _moov(duration_s, width, height, mdat_offset)
+    mdat_size = max(size - len(head), 8)
+    with open(path, 'wb') as f:
+        f.write(head)
+        f.write(struct.pack('>I4s', mdat_size, b'mdat'))
+        f.truncate(len(head) + mdat_size)
+
+
+# ---------- 生成目录 ----------
+
+def generate_tree(root, image_modes=None, brands=5, models=20, files=2000,
+                  component_files=10, component_records=5000, videos=20, video_mb=50, seed=0):
+    """在 root 下生成基准目录，返回各类文件数量"""
+    root = Path(root)
+    rng = random.Random(seed)
+    counts = {'images': 0, 'components': 0, 'videos': 0}
+    brand_list = brand_names(brands)
+
+    for mode in image_modes or IMAGE_MODES:
+        for brand in brand_list:
+            for model in model_names(models):
+                model_dir = root / mode / brand / model
+                model_dir.mkdir(parents=True, exist_ok=True)
+                for name in error_code_names(files, rng):
+                    (model_dir / f'{name}.jpg').write_bytes(PLACEHOLDER_IMAGE)
+                counts['images'] += files
+
+    for brand in brand_list:
+        brand_dir = root / COMPONENT_MODE / brand
+        brand_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(component_files):
+            title = f'{brand} Component {i:02d}'
+            payload = component_payload(title, component_records, rng)
+            (brand_dir / f'Component_{i:02d}.json').write_text(
+                json.dumps(payload, ensure_ascii=False), encoding='utf-8')
+            counts['components'] += 1
+
+    for brand in brand_list:
+        brand_dir = root / VIDEO_MODE / brand
+        brand_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(videos):
+            write_video(brand_dir / f'Tutorial {i:02d}.mp4', video_mb * 1024 * 1024,
+                        duration_s=rng.randint(30, 900))
+            counts['videos'] += 1
+    return counts
+
+
+def add_arguments(parser):
+    """生成参数，benchmarks.endpoints 复用"""
+    parser.add_argument('--modes', nargs='+', default=IMAGE_MODES, help='图片模式（一级目录）')
+    parser.add_argument('--brands', type=int, default=5)
+    parser.add_argument('--models', type=int, default=20, help='每个品牌的型号数')
+    parser.add_argument('--files', type=int, default=2000, help='每个型号的图片数')
+    parser.add_argument('--component-files', type=int, default=10, help='每个品牌的 JSON 文件数')
+    parser.add_argument('--component-records', type=int, default=5000, help='每个 JSON 文件的记录数')
+    parser.add_argument('--videos', type=int, default=20, help='每个品牌的视频数')
+    parser.add_argument('--video-mb', type=int, default=50, help='每个视频的大小（MB，稀疏文件）')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def tree_options(args):
+    return {
+        'image_modes': args.modes,
+        'brands': args.brands,
+        'models': args.models,
+        'files': args.files,
+        'component_files': args.component_files,
+        'component_records': args.component_records,
+        'videos': args.videos,
+        'video_mb': args.video_mb,
+        'seed': args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', help='输出目录')
+    add_arguments(parser)
+    args = parser.parse_args()
+    os.makedirs(args.output, exist_ok=True)
+    counts = generate_tree(args.output, **tree_options(args))
+    print(f"{args.output}: {counts['images']} images, {counts['components']} component files, "
+          f"{counts['videos']} videos")
+
+
+if __name__ == '__main__':
+    main()
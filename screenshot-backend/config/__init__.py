@@ -0,0 +1,2 @@
+# 数据库连接建立时设置 SQLite 参数（见 database.py）
+from . import database  # noqa: F401
@@ -0,0 +1,23 @@
+"""SQLite 连接设置
+
+每个新建的数据库连接上执行 SQLITE_PRAGMAS 中的 PRAGMA：
+WAL 模式下读写互不阻塞，synchronous=NORMAL 在 WAL 下仍保证数据库一致，
+busy_timeout 让写锁冲突时等待而不是立即报 database is locked，
+mmap_size 让读取直接走内存映射。连接配合 CONN_MAX_AGE 在请求之间复用，
+PRAGMA 只在建立连接时执行一次。
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created, dispatch_uid='configure_sqlite')
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,329 @@
+"""请求耗时统计
+
+MetricsMiddleware 为每个请求建立一个计时上下文，代码中用 timer('阶段') / count('计数项')
+记录各阶段耗时（认证、索引、搜索、写查询日志等）和计数（扫描文件数等），
+数据库查询次数与耗时通过 execute_wrapper 自动统计。响应带 Server-Timing 头，
+浏览器开发者工具中可直接看到各阶段耗时。
+
+每个 worker 在内存中按接口（URL name）累计延迟直方图和计数，每隔 METRICS_FLUSH_INTERVAL
+秒写一次快照到 METRICS_DIR/<pid>-<启动时间>.json；读取时合并所有 worker 的快照，
+以 Prometheus 文本格式（/api/metrics/，见 config/views.py）或后台统计面板展示。
+已退出 worker 的快照保留 METRICS_MAX_AGE 秒后删除。
+
+缓存、日志队列等组件用 register_stats 登记统计函数，其返回值随快照一起写出，
+读取时各 worker 相加（名称以 _max 结尾的取最大值）。
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+# 延迟直方图的桶上限（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """单个请求的阶段耗时（秒）和计数"""
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add(self, name, n):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add_phase('db', time.perf_counter() - started)
+            self.add('db_queries', 1)
+
+
+@contextmanager
+def timer(name):
+    """记录当前请求中一个阶段的耗时；不在请求中（后台线程、管理命令）时不做任何事"""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add_phase(name, time.perf_counter() - started)
+
+
+def count(name, n=1):
+    """累加当前请求的计数项"""
+    current = _current.get()
+    if current is not None:
+        current.add(name, n)
+
+
+# ---------- worker 内累计 ----------
+
+def _new_endpoint():
+    return {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0,
+            'status': {}, 'phases': {}, 'counters': {}}
+
+
+def _merge_endpoint(into, other):
+    into['buckets'] = [a + b for a, b in zip(into['buckets'], other['buckets'])]
+    into['sum'] += other['sum']
+    into['count'] += other['count']
+    for key in ('status', 'phases', 'counters'):
+        for name, value in other[key].items():
+            into[key][name] = into[key].get(name, 0) + value
+
+
+_stats_sources = {}
+
+
+def register_stats(source, func):
+    """登记组件统计：func() 返回 {名称: 数值}，随每个 worker 的快照写出"""
+    _stats_sources[source] = func
+
+
+def collect_stats():
+    """当前 worker 各组件的统计"""
+    stats = {}
+    for source, func in list(_stats_sources.items()):
+        try:
+            stats[source] = func()
+        except Exception:
+            continue
+    return stats
+
+
+def _merge_stats(into, other):
+    for source, values in other.items():
+        merged = into.setdefault(source, {})
+        for name, value in values.items():
+            if name.endswith('_max'):
+                merged[name] = max(merged.get(name, value), value)
+            else:
+                merged[name] = merged.get(name, 0) + value
+
+
+class MetricsRegistry:
+    """当前 worker 的累计数据，定期写快照文件供其他 worker 合并"""
+
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self.started = time.time()
+        self.name = f'{os.getpid()}-{int(self.started * 1000)}'
+
+    def observe(self, endpoint, status, duration, request_metrics):
+        bucket = next((i for i, limit in enumerate(BUCKETS) if duration <= limit), len(BUCKETS))
+        status_class = f'{status // 100}xx'
+        with self._lock:
+            data = self.endpoints.get(endpoint)
+            if data is None:
+                data = self.endpoints[endpoint] = _new_endpoint()
+            data['buckets'][bucket] += 1
+            data['sum'] += duration
+            data['count'] += 1
+            data['status'][status_class] = data['status'].get(status_class, 0) + 1
+            for name, seconds in request_metrics.phases.items():
+                data['phases'][name] = data['phases'].get(name, 0.0) + seconds
+            for name, n in request_metrics.counters.items():
+                data['counters'][name] = data['counters'].get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self.endpoints))
+
+    def flush(self, force=False):
+        """写快照文件；距上次写入不足 METRICS_FLUSH_INTERVAL 秒时跳过（force 除外）"""
+        now = time.monotonic()
+        if not force and now - self._last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 10):
+            return
+        self._last_flush = now
+        directory = metrics_dir()
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp = directory / f'.{self.name}.{threading.get_ident()}.tmp'
+            tmp.write_text(json.dumps({
+                'started': self.started,
+                'endpoints': self.snapshot(),
+                'stats': collect_stats(),
+            }))
+            os.replace(tmp, directory / f'{self.name}.json')
+        except OSError:
+            pass
+
+
+_registry = None
+_registry_pid = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry, _registry_pid
+    if _registry is None or _registry_pid != os.getpid():
+        with _registry_lock:
+            if _registry is None or _registry_pid != os.getpid():
+                _registry = MetricsRegistry()
+                _registry_pid = os.getpid()
+    return _registry
+
+
+def metrics_dir():
+    return settings.METRICS_DIR
+
+
+def aggregate_metrics():
+    """合并所有 worker 的快照，返回 ({接口: 数据}, {组件: 统计}, worker 数)"""
+    get_registry().flush(force=True)
+    max_age = getattr(settings, 'METRICS_MAX_AGE', 86400)
+    now = time.time()
+    merged = {}
+    stats = {}
+    workers = 0
+    try:
+        entries = list(os.scandir(metrics_dir()))
+    except OSError:
+        entries = []
+    for entry in entries:
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            if now - entry.stat().st_mtime > max_age:
+                os.unlink(entry.path)
+                continue
+            with open(entry.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        workers += 1
+        for endpoint, values in data['endpoints'].items():
+            _merge_endpoint(merged.setdefault(endpoint, _new_endpoint()), values)
+        _merge_stats(stats, data.get('stats', {}))
+    return merged, stats, workers
+
+
+def estimate_quantile(data, q):
+    """按直方图估算分位数（秒），桶内线性插值"""
+    total = data['count']
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    lower = 0.0
+    for i, n in enumerate(data['buckets']):
+        upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+        if n and seen + n >= rank:
+            return lower + (upper - lower) * (rank - seen) / n
+        seen += n
+        lower = upper
+    return BUCKETS[-1]
+
+
+# ---------- 中间件 ----------
+
+def _endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route or 'unmatched'
+
+
+class MetricsMiddleware:
+    """统计请求耗时并输出 Server-Timing 头"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(request_metrics.db_wrapper):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        request_metrics.add('response_bytes', size)
+
+        registry = get_registry()
+        registry.observe(_endpoint_name(request), response.status_code, duration, request_metrics)
+        registry.flush()
+
+        if getattr(settings, 'METRICS_SERVER_TIMING', True):
+            parts = []
+            for name, seconds in request_metrics.phases.items():
+                part = f'{name};dur={seconds * 1000:.2f}'
+                if name == 'db':
+                    part += f';desc="{request_metrics.counters.get("db_queries", 0)} queries"'
+                parts.append(part)
+            parts.append(f'total;dur={duration * 1000:.2f}')
+            response['Server-Timing'] = ', '.join(parts)
+        return response
+
+
+# ---------- Prometheus ----------
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+def render_prometheus(endpoints, stats, workers):
+    lines = [
+        '# HELP screenshot_metrics_workers Worker snapshots included in this output',
+        '# TYPE screenshot_metrics_workers gauge',
+        f'screenshot_metrics_workers {workers}',
+        '# HELP screenshot_request_duration_seconds Request latency by endpoint',
+        '# TYPE screenshot_request_duration_seconds histogram',
+    ]
+    for endpoint, data in sorted(endpoints.items()):
+        cumulative = 0
+        for limit, n in zip(BUCKETS + ('+Inf',), data['buckets']):
+            cumulative += n
+            lines.append(f'screenshot_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=limit)} {cumulative}')
+        lines.append(f'screenshot_request_duration_seconds_sum{_labels(endpoint=endpoint)} {data["sum"]:.6f}')
+        lines.append(f'screenshot_request_duration_seconds_count{_labels(endpoint=endpoint)} {data["count"]}')
+
+    lines += ['# HELP screenshot_requests_total Requests by endpoint and status class',
+              '# TYPE screenshot_requests_total counter']
+    for endpoint, data in sorted(endpoints.items()):
+        for status, n in sorted(data['status'].items()):
+            lines.append(f'screenshot_requests_total{_labels(endpoint=endpoint, status=status)} {n}')
+
+    lines += ['# HELP screenshot_phase_seconds_total Time spent in instrumented phases',
+              '# TYPE screenshot_phase_seconds_total counter']
+    for endpoint, data in sorted(endpoints.items()):
+        for phase, seconds in sorted(data['phases'].items()):
+            lines.append(f'screenshot_phase_seconds_total{_labels(endpoint=endpoint, phase=phase)} {seconds:.6f}')
+
+    counter_names = sorted({name for data in endpoints.values() for name in data['counters']})
+    for name in counter_names:
+        lines += [f'# TYPE screenshot_{name}_total counter']
+        for endpoint, data in sorted(endpoints.items()):
+            if name in data['counters']:
+                lines.append(f'screenshot_{name}_total{_labels(endpoint=endpoint)} {data["counters"][name]}')
+
+    # 组件统计（合并所有 worker）
+    for source, values in sorted(stats.items()):
+        for name, value in sorted(values.items()):
+            lines += [f'# TYPE screenshot_{source}_{name} gauge', f'screenshot_{source}_{name} {value}']
+    return '\n'.join(lines) + '\n'
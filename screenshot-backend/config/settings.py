@@ -21,6 +21,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -56,9 +57,21 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'data' / 'db.sqlite3',
+        # 每个 gunicorn 线程的连接在请求之间复用，不再每个请求重新打开
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# 新建 SQLite 连接时执行的 PRAGMA（见 config/database.py），设为 {} 则使用 SQLite 默认设置
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # 读写并发
+    'synchronous': 'NORMAL',  # WAL 下只在 checkpoint 时 fsync
+    'busy_timeout': 20000,  # 等待写锁的毫秒数
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 # 确保 data 目录存在
 (BASE_DIR / 'data').mkdir(exist_ok=True)
 
@@ -85,6 +98,69 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # 截图文件存放目录
 SCREENSHOTS_ROOT = BASE_DIR / 'screenshots'
 
+# 截图目录内存索引：每个 worker 启动后扫描一次，之后按目录变化增量刷新
+# 监听方式：auto（优先 inotify，不可用时轮询）/ inotify / poll
+CATALOG_WATCH_MODE = os.environ.get('CATALOG_WATCH_MODE', 'auto')
+CATALOG_POLL_INTERVAL = 5  # 轮询间隔（秒）
+CATALOG_SCAN_WORKERS = 8  # 冷启动并行扫描线程数
+CATALOG_EXCLUDED_DIRS = ('temp_chunks', '.thumbnails', '.blobs')  # 不进入扫描的一级目录
+
+# 图片搜索分页：传 limit/cursor 时每页条数的默认值与上限
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_LIMIT = 500
+# 跨型号搜索（search-all/）：每组默认返回条数、默认分组数与分组数上限
+GLOBAL_SEARCH_GROUP_SIZE = 5
+GLOBAL_SEARCH_MAX_GROUPS = 50
+GLOBAL_SEARCH_GROUP_LIMIT = 500
+# 批量搜索（search-batch/）一次最多的关键词数
+BATCH_SEARCH_MAX_KEYWORDS = 50
+
+# Component IO Check 数据缓存（每个 worker，按渲染后字节数计）
+COMPONENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+COMPONENT_INDEX_CACHE_MAX_BYTES = 128 * 1024 * 1024  # 记录索引缓存（component-query 接口）
+
+# 搜索结果缩略图：镜像存放在截图目录下的隐藏目录，由 nginx 的 /screenshots/ 直接提供
+THUMBNAIL_ROOT = SCREENSHOTS_ROOT / '.thumbnails'
+THUMBNAIL_URL = '/screenshots/.thumbnails/'
+THUMBNAIL_WIDTH = 320  # 固定宽度（像素），高度按比例
+THUMBNAIL_FORMAT = 'WEBP'  # WEBP 或 JPEG
+THUMBNAIL_QUALITY = 75
+THUMBNAIL_WORKERS = 2  # 每个 worker 的生成进程数
+THUMBNAIL_TIMEOUT = 5  # 请求内等待生成的最长时间（秒），超时先跳转原图，生成在后台继续
+
+# 分片上传：合并在后台线程中执行，进度写在 temp_chunks/.jobs
+UPLOAD_MERGE_WORKERS = 2  # 每个 worker 同时合并的任务数
+UPLOAD_MAX_CHUNKS = 10000  # 单个上传的最大分片数
+UPLOAD_MAX_SIZE = 4 * 1024 * 1024 * 1024  # 流式上传的最大文件大小（创建会话时按此预分配空间）
+UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024  # 流式上传的最大分片大小
+STREAM_UPLOAD_EXPIRE_SECONDS = 86400  # 超过该时间没有写入的流式上传会话被删除，释放预分配的空间
+UPLOAD_TOKEN_TTL = 3600  # 上传 token 有效期（秒）
+UPLOAD_USER_CACHE_TTL = 60  # 合并时 token 用户的进程内缓存时间（秒）
+# 上传视频的内容寻址存储（需与截图目录在同一文件系统，才能硬链接去重）
+VIDEO_BLOB_ROOT = SCREENSHOTS_ROOT / '.blobs'
+VIDEO_FASTSTART = True  # 上传完成后把 MP4 的 moov 移到文件开头，便于边下边播
+
+# 查询日志：每个 worker 内存队列攒批后用 bulk_create 写入
+QUERY_LOG_ASYNC = True  # False 时每次请求同步写入（测试用）
+QUERY_LOG_QUEUE_SIZE = 10000  # 队列上限，超出的日志丢弃并计数
+QUERY_LOG_BATCH_SIZE = 200  # 攒够多少条写一次
+QUERY_LOG_FLUSH_INTERVAL = 2  # 最长等待多少秒写一次
+# 查询日志归档：数据库只保留最近 N 天，更早的由 archive_query_logs 命令移到按月压缩的 CSV
+QUERY_LOG_RETENTION_DAYS = 90
+QUERY_LOG_ARCHIVE_ROOT = BASE_DIR / 'data' / 'query_log_archive'
+QUERY_LOG_ARCHIVE_BATCH_SIZE = 5000  # 每批归档并删除的条数
+
+# 请求耗时统计（config/metrics.py）：各 worker 定期把累计数据写到 METRICS_DIR，读取时合并
+METRICS_DIR = BASE_DIR / 'data' / 'metrics'
+METRICS_FLUSH_INTERVAL = 10  # worker 写快照的最小间隔（秒）
+METRICS_MAX_AGE = 86400  # 超过这么久未更新的快照（已退出的 worker）删除
+METRICS_SERVER_TIMING = True  # 响应中输出 Server-Timing 头
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # Prometheus 抓取 /api/metrics/ 时使用的 Bearer token
+
+# Excel 批量导入用户
+USER_IMPORT_HASH_WORKERS = 4  # 计算密码哈希的进程数
+USER_IMPORT_BATCH_SIZE = 500  # 每批 bulk_create 的用户数
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # 自定义用户模型
@@ -104,6 +180,32 @@ CSRF_TRUSTED_ORIGINS = [
     'https://upload.archercopier.xyz',
 ]
 
+# 缓存：会话与登录用户缓存在 auth 缓存中。默认用文件缓存，所有 gunicorn worker 共享，
+# 退出登录、修改密码后其他 worker 立即失效；单进程开发时可改为 locmem
+AUTH_CACHE_BACKEND = os.environ.get('AUTH_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'auth': {
+        'BACKEND': AUTH_CACHE_BACKEND,
+        'LOCATION': str(BASE_DIR / 'data' / 'auth_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+AUTH_CACHE_ALIAS = 'auth'
+AUTH_USER_CACHE_TIMEOUT = 300  # 用户对象缓存时间（秒），用户变更时立即清除
+
+# 会话先读缓存，未命中再查数据库
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'auth'
+
+# 保留 ModelBackend，升级前登录的会话仍然有效
+AUTHENTICATION_BACKENDS = [
+    'apps.users.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Session Cookie 设置
 SESSION_COOKIE_SAMESITE = 'None'
 SESSION_COOKIE_SECURE = True  # 如果用 HTTPS 改成 True
@@ -3,10 +3,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('apps.users.urls')),
     path('api/screenshots/', include('apps.screenshots.urls')),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
     path('i18n/', include('django.conf.urls.i18n')),
 ]
 
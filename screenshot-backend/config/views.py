@@ -0,0 +1,28 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.permissions import BasePermission
+from rest_framework.views import APIView
+
+from .metrics import aggregate_metrics, render_prometheus
+
+
+class IsStaffOrMetricsToken(BasePermission):
+    """管理员登录，或请求头 Authorization: Bearer <METRICS_TOKEN>（供 Prometheus 抓取）"""
+
+    def has_permission(self, request, view):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return True
+        return bool(request.user and request.user.is_staff)
+
+
+class MetricsView(APIView):
+    """Prometheus 文本格式的接口统计（合并所有 worker）"""
+    permission_classes = [IsStaffOrMetricsToken]
+
+    def get(self, request):
+        endpoints, stats, workers = aggregate_metrics()
+        return HttpResponse(render_prometheus(endpoints, stats, workers),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')